@@ -1,5 +1,94 @@
+from datetime import datetime, time
+
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
+
+from .archive import search_archive
+from .export import export_response
 from .models import ContactMessage, UserProfile
+from .pagination import EstimatedCountPaginator, KeysetPaginator
+from .renditions import current_renditions
+from .search import search_contact_messages
+from .templatetags.profile_pictures import profile_picture
+
+# The smallest rendition (see PROFILE_PICTURE_RENDITION_SIZES).
+THUMBNAIL_SIZE = 48
+
+AFTER_VAR = 'after'
+BEFORE_VAR = 'before'
+
+
+class KeysetChangeList(ChangeList):
+    """
+    Changelist paged by ``KeysetPaginator`` (``?after=`` / ``?before=``
+    cursors) while the default ordering is in use. Sorting by a column or
+    "Show all" falls back to the regular numbered pages.
+    """
+
+    def __init__(self, request, *args, **kwargs):
+        self.after = request.GET.get(AFTER_VAR)
+        self.before = request.GET.get(BEFORE_VAR)
+        self.newer_url = self.older_url = None
+        self.keyset = False
+        self.count_is_estimate = False
+        super().__init__(request, *args, **kwargs)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(AFTER_VAR, None)
+        lookup_params.pop(BEFORE_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # A cursor only makes sense for the exact listing it came from.
+        return super().get_query_string(new_params, [*(remove or []), AFTER_VAR, BEFORE_VAR])
+
+    def get_results(self, request):
+        if ORDER_VAR in self.params or self.show_all:
+            super().get_results(request)
+            self.count_is_estimate = getattr(self.paginator, 'count_is_estimate', False)
+            return
+
+        paginator = KeysetPaginator(self.queryset, self.model_admin.keyset_ordering, self.list_per_page)
+        try:
+            result_list, newer, older = paginator.page(after=self.after, before=self.before)
+        except ValueError:
+            raise IncorrectLookupParameters
+
+        self.keyset = True
+        count_paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        self.result_count = count_paginator.count
+        self.count_is_estimate = getattr(count_paginator, 'count_is_estimate', False)
+        self.show_full_result_count = self.full_result_count = None
+        self.show_admin_actions = True
+        self.result_list = result_list
+        self.can_show_all = False
+        # The numbered links are replaced by admin/main/contactmessage/pagination.html.
+        self.multi_page = False
+        self.paginator = paginator
+        if newer:
+            self.newer_url = self.get_query_string({BEFORE_VAR: newer})
+        if older:
+            self.older_url = self.get_query_string({AFTER_VAR: older})
+
+
+class ArchiveLookupForm(forms.Form):
+    email = forms.EmailField(required=False)
+    since = forms.DateField(required=False, help_text="From this day (inclusive)")
+    until = forms.DateField(required=False, help_text="Up to this day (inclusive)")
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not any(cleaned_data.get(name) for name in ('email', 'since', 'until')):
+            raise forms.ValidationError("Enter an email address or a date range.")
+        return cleaned_data
+
 
 # Register ContactMessage model
 @admin.register(ContactMessage)
@@ -8,13 +97,79 @@ class ContactMessageAdmin(admin.ModelAdmin):
     list_filter = ('submitted_at',)
     search_fields = ('name', 'email', 'phone')
     readonly_fields = ('submitted_at',)
+    ordering = ('-submitted_at', '-id')
+    keyset_ordering = ('-submitted_at', '-id')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # With "select all", the queryset is the filtered changelist (e.g. a
+    # submitted_at range), streamed rather than loaded.
+    actions = ('export_csv', 'export_ndjson')
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        # The full-text index (main/search.py) rather than icontains scans;
+        # search_fields only switches the search box on.
+        if not search_term.strip():
+            return queryset, False
+        return search_contact_messages(search_term, queryset), False
+
+    @admin.action(description="Export selected contact messages as CSV")
+    def export_csv(self, request, queryset):
+        return export_response(queryset, 'csv', self._export_filename())
+
+    @admin.action(description="Export selected contact messages as NDJSON")
+    def export_ndjson(self, request, queryset):
+        return export_response(queryset, 'ndjson', self._export_filename())
+
+    def _export_filename(self):
+        return f"contact-messages-{timezone.localtime():%Y%m%d-%H%M%S}"
+
+    def get_urls(self):
+        return [
+            path('archive/', self.admin_site.admin_view(self.archive_view), name='main_contactmessage_archive'),
+        ] + super().get_urls()
+
+    def archive_view(self, request):
+        """Look up messages moved out of the table by archive_contact_messages."""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        form = ArchiveLookupForm(request.GET or None)
+        results = None
+        if form.is_valid():
+            since, until = form.cleaned_data['since'], form.cleaned_data['until']
+            results = search_archive(
+                email=form.cleaned_data['email'] or None,
+                since=timezone.make_aware(datetime.combine(since, time.min)) if since else None,
+                until=timezone.make_aware(datetime.combine(until, time.max)) if until else None,
+            )
+        context = {
+            **self.admin_site.each_context(request),
+            'title': "Archived contact messages",
+            'opts': self.model._meta,
+            'form': form,
+            'results': results,
+        }
+        return TemplateResponse(request, 'admin/main/contactmessage/archive.html', context)
 
 
 # Register UserProfile model
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
-    list_display = ('user', 'phone', 'created_at', 'updated_at')
+    list_display = ('thumbnail', 'user', 'phone', 'created_at', 'updated_at')
+    list_display_links = ('user',)
+    list_select_related = ('user',)
     list_filter = ('created_at', 'updated_at')
     search_fields = ('user__username', 'user__email', 'phone')
     readonly_fields = ('created_at', 'updated_at')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
+    @admin.display(description="Picture")
+    def thumbnail(self, obj):
+        # Only ever the stored renditions: a page of full-size originals
+        # would be megabytes per row. None while pending, {} if rendering failed.
+        if not current_renditions(obj):
+            return '-'
+        return profile_picture(obj, THUMBNAIL_SIZE, alt=obj.user.username)
@@ -0,0 +1,180 @@
+"""
+Cold storage for old contact messages.
+
+``manage.py archive_contact_messages`` moves rows older than
+``CONTACT_ARCHIVE_AFTER_DAYS`` out of the database into gzipped NDJSON
+segments under ``CONTACT_ARCHIVE_DIR``, one per month of ``submitted_at``:
+
+    contact-2024-01.ndjson.gz     gzip members appended batch by batch
+    contact-2024-01.index.jsonl   one line per member: byte offset and length,
+                                  row count, first/last submitted_at, and a
+                                  Bloom filter of the senders' emails
+
+Segments are only ever appended to. A batch is written and fsynced before its
+rows are deleted, so a crash can leave a batch both archived and live (it is
+archived again next run; lookups drop the repeated ids), never lost. A member
+torn by a crash has no index line and is skipped.
+
+``search_archive()`` reads the index first and decompresses only the members
+whose date range and email filter can match.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .dedup import BloomFilter
+from .export import EXPORT_FIELDS
+
+SEGMENT_SUFFIX = '.ndjson.gz'
+INDEX_SUFFIX = '.index.jsonl'
+
+
+def archive_dir():
+    return str(getattr(settings, 'CONTACT_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'var', 'contact_archive')))
+
+
+def archive_cutoff(days=None):
+    if days is None:
+        days = getattr(settings, 'CONTACT_ARCHIVE_AFTER_DAYS', 90)
+    return timezone.now() - timedelta(days=days)
+
+
+def email_key(email):
+    return hashlib.sha256((email or '').strip().lower().encode('utf-8')).hexdigest()
+
+
+def _month(moment):
+    # Segments are split by UTC month whatever TIME_ZONE is.
+    return f'{moment.astimezone(dt_timezone.utc):%Y-%m}'
+
+
+def _segment_paths(directory, month):
+    base = os.path.join(directory, f'contact-{month}')
+    return base + SEGMENT_SUFFIX, base + INDEX_SUFFIX
+
+
+def _fsync_append(path, data):
+    """Append ``data`` to ``path`` durably; returns the offset it was written at."""
+    with open(path, 'ab') as f:
+        offset = f.tell()
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    return offset
+
+
+def append_member(directory, month, rows):
+    """Append ``rows`` (dicts with EXPORT_FIELDS) as one gzip member of the month's segment."""
+    os.makedirs(directory, exist_ok=True)
+    segment_path, index_path = _segment_paths(directory, month)
+    payload = ''.join(
+        json.dumps(dict(row, submitted_at=row['submitted_at'].isoformat())) + '\n' for row in rows
+    ).encode('utf-8')
+    member = gzip.compress(payload)
+    offset = _fsync_append(segment_path, member)
+
+    emails = BloomFilter(capacity=len(rows))
+    for row in rows:
+        emails.add(email_key(row['email']))
+    entry = {
+        'offset': offset,
+        'length': len(member),
+        'rows': len(rows),
+        'first': min(row['submitted_at'] for row in rows).isoformat(),
+        'last': max(row['submitted_at'] for row in rows).isoformat(),
+        'emails': emails.to_dict(),
+    }
+    _fsync_append(index_path, (json.dumps(entry) + '\n').encode('utf-8'))
+
+
+def archive_batch(queryset, directory):
+    """
+    Archive then delete the rows of ``queryset`` (a bounded slice); returns
+    the number of rows moved.
+    """
+    from .models import ContactMessage
+
+    rows = list(queryset.values(*EXPORT_FIELDS))
+    if not rows:
+        return 0
+    by_month = {}
+    for row in rows:
+        by_month.setdefault(_month(row['submitted_at']), []).append(row)
+    for month, month_rows in by_month.items():
+        append_member(directory, month, month_rows)
+    with transaction.atomic():
+        ContactMessage.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+    return len(rows)
+
+
+def _iter_index(index_path):
+    with open(index_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue  # torn by a crash mid-append
+
+
+def _read_member(segment_path, entry):
+    with open(segment_path, 'rb') as f:
+        f.seek(entry['offset'])
+        data = gzip.decompress(f.read(entry['length']))
+    for line in data.decode('utf-8').splitlines():
+        row = json.loads(line)
+        row['submitted_at'] = parse_datetime(row['submitted_at'])
+        yield row
+
+
+def search_archive(email=None, since=None, until=None, limit=500, directory=None):
+    """
+    Archived messages from ``email`` (case-insensitive) submitted in
+    ``[since, until)``, newest month first; at most ``limit`` rows.
+    """
+    directory = directory or archive_dir()
+    if not os.path.isdir(directory):
+        return []
+    key = email_key(email) if email else None
+    wanted_email = email.strip().lower() if email else None
+    months = sorted(
+        (name[len('contact-'):-len(INDEX_SUFFIX)] for name in os.listdir(directory) if name.endswith(INDEX_SUFFIX)),
+        reverse=True,
+    )
+
+    results, seen_ids = [], set()
+    for month in months:
+        if since is not None and month < _month(since):
+            break
+        if until is not None and month > _month(until):
+            continue
+        segment_path, index_path = _segment_paths(directory, month)
+        for entry in _iter_index(index_path):
+            if since is not None and parse_datetime(entry['last']) < since:
+                continue
+            if until is not None and parse_datetime(entry['first']) >= until:
+                continue
+            if key is not None and key not in BloomFilter.from_dict(entry['emails']):
+                continue
+            for row in _read_member(segment_path, entry):
+                if row['id'] in seen_ids:
+                    continue
+                if wanted_email is not None and (row['email'] or '').strip().lower() != wanted_email:
+                    continue
+                if since is not None and row['submitted_at'] < since:
+                    continue
+                if until is not None and row['submitted_at'] >= until:
+                    continue
+                seen_ids.add(row['id'])
+                results.append(row)
+        if len(results) >= limit:
+            break  # older months can't make the cut
+    results.sort(key=lambda row: (row['submitted_at'], row['id']), reverse=True)
+    return results[:limit]
@@ -0,0 +1,402 @@
+"""
+Per-page CSS/JS bundles, built by ``collectstatic``.
+
+Each page loads one stylesheet and (at most) one script: ``ASSET_BUNDLES``
+lists the static files concatenated into ``bundles/<name>``, in cascade
+order. ``ResponsiveStaticFilesStorage`` (main/responsive.py) writes the
+minified bundles *before* the manifest step, so they are hashed, compressed
+and served with far-future ``Cache-Control: immutable`` by WhiteNoise like
+any other static file; ``url()``s are rebased onto ``bundles/`` and then
+rewritten to hashed names as usual.
+
+Third-party files (cropperjs, typed.js, Font Awesome, the Google Fonts
+families) are vendored under ``vendor/`` by ``manage.py vendor_assets``,
+pinned in ``VENDOR_ASSETS``. A vendored file that has not been fetched yet is
+left out of its bundle and loaded from its CDN instead, so a fresh checkout
+keeps working; ``check --deploy`` warns about it.
+
+``CRITICAL_CSS`` names, per bundle, the selector prefixes of above-the-fold
+rules. They (plus the ``@font-face`` and ``@keyframes`` rules they use) are
+written to ``bundles/<name>.critical.css``, which ``{% css_bundle %}``
+inlines while the full stylesheet loads without blocking render.
+"""
+
+import functools
+import json
+import posixpath
+import re
+from urllib.parse import urljoin
+
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core import checks
+from django.templatetags.static import static
+
+GOOGLE_FONTS = (
+    'https://fonts.googleapis.com/css2?family=Inter:ital,opsz,wght@0,14..32,100..900;1,14..32,100..900'
+    '&family=Montserrat:ital,wght@0,100..900;1,100..900&family=Roboto:ital,wght@0,500;1,500&display=swap'
+)
+POPPINS = (
+    'https://fonts.googleapis.com/css2?family=Poppins:ital,wght@0,100;0,200;0,300;0,400;0,500;0,600;'
+    '0,700;0,800;0,900;1,100;1,200;1,300;1,400;1,500;1,600;1,700;1,800;1,900&display=swap'
+)
+
+# static path -> where it comes from. "integrity" (SRI) is checked when
+# fetching; "minified" files are bundled as they are.
+VENDOR_ASSETS = {
+    'vendor/cropperjs-1.6.1/cropper.min.css': {
+        'url': 'https://cdnjs.cloudflare.com/ajax/libs/cropperjs/1.6.1/cropper.min.css',
+        'minified': True,
+    },
+    'vendor/cropperjs-1.6.1/cropper.min.js': {
+        'url': 'https://cdnjs.cloudflare.com/ajax/libs/cropperjs/1.6.1/cropper.min.js',
+        'minified': True,
+    },
+    'vendor/typed.js-2.1.0/typed.umd.js': {
+        'url': 'https://unpkg.com/typed.js@2.1.0/dist/typed.umd.js',
+        'minified': True,
+    },
+    'vendor/fontawesome-7.0.1/css/all.min.css': {
+        'url': 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/7.0.1/css/all.min.css',
+        'integrity': 'sha512-2SwdPD6INVrV/lHTZbO2nodKhrnDdJK9/kg2XD1r9uGqPo1cUbujc+IYdlYdEErWNu69gVcYgdxlmVmzTWnetw==',
+        'minified': True,
+    },
+    'vendor/fonts/fonts.css': {'url': GOOGLE_FONTS},
+    'vendor/fonts/poppins.css': {'url': POPPINS},
+}
+
+FONT_AWESOME = 'vendor/fontawesome-7.0.1/css/all.min.css'
+
+ASSET_BUNDLES = {
+    'home.css': ('css/style.css', 'css/notifications.css', FONT_AWESOME, 'vendor/fonts/fonts.css'),
+    'home.js': ('vendor/typed.js-2.1.0/typed.umd.js', 'js/home.js'),
+    'services.css': ('css/services.css', FONT_AWESOME, 'vendor/fonts/fonts.css'),
+    'services.js': ('js/service.js',),
+    'contact.css': ('css/contact.css', FONT_AWESOME, 'vendor/fonts/fonts.css'),
+    'contact.js': ('js/contact.js',),
+    'login.css': ('vendor/fonts/poppins.css', 'css/login.css', FONT_AWESOME),
+    'login.js': ('js/login.js',),
+    'profile.css': (
+        'css/profile.css', FONT_AWESOME, 'vendor/fonts/fonts.css', 'vendor/cropperjs-1.6.1/cropper.min.css',
+    ),
+    'profile.js': ('vendor/cropperjs-1.6.1/cropper.min.js',),
+}
+
+CRITICAL_CSS = {
+    'home.css': ('*', 'picture', 'body', '.navbar', '.bar', '.effect', '.hero', '.img1', '.btn', '.fade'),
+}
+
+BUNDLE_DIR = 'bundles'
+BUNDLE_MANIFEST = 'asset-bundles.json'
+
+
+def bundle_path(name):
+    return posixpath.join(BUNDLE_DIR, name)
+
+
+def critical_path(name):
+    base, ext = posixpath.splitext(name)
+    return bundle_path(f'{base}.critical{ext}')
+
+
+# --- minification -------------------------------------------------------------
+# Deliberately conservative: comments and redundant whitespace go, nothing is
+# renamed or reordered.
+
+def _skip_string(text, i):
+    """Index just past the string or regex literal starting at ``text[i]``."""
+    quote, j, n, in_class = text[i], i + 1, len(text), False
+    while j < n:
+        ch = text[j]
+        if ch == '\\':
+            j += 2
+            continue
+        if quote == '/' and ch == '[':
+            in_class = True
+        elif quote == '/' and ch == ']':
+            in_class = False
+        elif ch == quote and not in_class:
+            j += 1
+            break
+        elif ch == '\n' and quote != '`':
+            break
+        j += 1
+    if quote == '/':
+        while j < n and text[j].isalpha():
+            j += 1
+    return j
+
+
+# At-rules whose blocks hold rules rather than declarations.
+CSS_GROUPING_RULES = ('@media', '@supports', '@document', '@layer', '@container', '@keyframes', '@-webkit-keyframes')
+
+
+def minify_css(text):
+    out = []
+    space = False
+    # Per open block: does it hold declarations (where ``color : red`` may lose
+    # its spaces) rather than selectors (where ``a :hover`` may not)?
+    declarations = []
+    statement = 0  # index in out where the current selector/prelude starts
+    i, n = 0, len(text)
+    while i < n:
+        ch = text[i]
+        if text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            end = n if end == -1 else end + 2
+            if text.startswith('/*!', i):
+                out.append(text[i:end])
+            i = end
+            continue
+        if ch.isspace():
+            space = True
+            i += 1
+            continue
+        if ch in '"\'':
+            end = _skip_string(text, i)
+            token = text[i:end]
+        else:
+            end, token = i + 1, ch
+        in_declarations = declarations and declarations[-1]
+        if (space and out and out[-1][-1] not in '{};,>:' and ch not in '{};,>)'
+                and not (ch == ':' and in_declarations)):
+            out.append(' ')
+        space = False
+        if ch == '{':
+            declarations.append(not ''.join(out[statement:]).lstrip().startswith(CSS_GROUPING_RULES))
+        elif ch == '}':
+            if declarations:
+                declarations.pop()
+            if out and out[-1] == ';':
+                out.pop()
+        out.append(token)
+        if ch in '{};':
+            statement = len(out)
+        i = end
+    return ''.join(out)
+
+
+JS_REGEX_AFTER = set('(,=:[!&|?{};+-*%<>~^')
+JS_REGEX_KEYWORDS = {'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void', 'throw', 'case', 'do', 'else'}
+JS_WORD = re.compile(r'[\w$]')
+
+
+def _regex_allowed(out):
+    """Whether a ``/`` after the tokens in ``out`` starts a regex literal (vs. division)."""
+    word = []
+    for token in reversed(out):
+        if token.isspace():
+            if word:
+                break
+            continue
+        if len(token) != 1 or not JS_WORD.match(token):
+            if word:
+                break
+            return len(token) == 1 and token in JS_REGEX_AFTER
+        word.append(token)
+    return not word or ''.join(reversed(word)) in JS_REGEX_KEYWORDS
+
+
+def _needs_space(before, after):
+    return (
+        (JS_WORD.match(before) and JS_WORD.match(after))
+        or (before in '+-' and after in '+-')
+        or (before == '/' and after == '/')
+    )
+
+
+def minify_js(text):
+    """
+    Strip comments and indentation. Line breaks are kept unless the previous
+    line ended in ``{``, ``;`` or ``,`` (so automatic semicolon insertion is
+    unaffected); template literals are copied verbatim, up to the closing
+    backtick.
+    """
+    out = []
+    pending = ''
+    i, n = 0, len(text)
+    while i < n:
+        ch = text[i]
+        if ch == '\n':
+            pending = '\n'
+            i += 1
+            continue
+        if ch.isspace():
+            pending = pending or ' '
+            i += 1
+            continue
+        if text.startswith('//', i):
+            end = text.find('\n', i)
+            i = n if end == -1 else end
+            continue
+        if text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            end = n if end == -1 else end + 2
+            pending = '\n' if '\n' in text[i:end] else (pending or ' ')
+            i = end
+            continue
+        if ch in '\'"`' or (ch == '/' and _regex_allowed(out)):
+            end = _skip_string(text, i)
+            token = text[i:end]
+        else:
+            end, token = i + 1, ch
+        if pending and out:
+            before = out[-1][-1]
+            if pending == '\n' and before not in '{;,':
+                out.append('\n')
+            elif _needs_space(before, token[0]):
+                out.append(' ')
+        pending = ''
+        out.append(token)
+        i = end
+    return ''.join(out)
+
+
+# --- bundling -----------------------------------------------------------------
+
+CSS_URL_RE = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+
+def rebase_css_urls(css, source, target):
+    """Rewrite ``css``'s relative ``url()``s from ``source``'s directory to ``target``'s."""
+    source_dir, target_dir = posixpath.dirname(source), posixpath.dirname(target)
+
+    def rebase(match):
+        quote, url = match.groups()
+        if url.startswith(('/', '#', 'data:')) or '://' in url:
+            return match.group(0)
+        path = posixpath.normpath(posixpath.join(source_dir, url))
+        return f'url({quote}{posixpath.relpath(path, target_dir or ".")}{quote})'
+
+    return CSS_URL_RE.sub(rebase, css)
+
+
+def build_bundle(name, sources, read):
+    """
+    Concatenate and minify ``sources`` into ``bundles/<name>``. ``read(path)``
+    returns a source's text, or None if it isn't available (a vendored file
+    not fetched yet).
+
+    Returns ``(content, before, after)``: the bundle and the CDN URLs of the
+    sources it had to leave out, split into those listed before its first
+    bundled source and the rest, so pages keep the sources' cascade order.
+    """
+    is_css = name.endswith('.css')
+    target = bundle_path(name)
+    parts, before, after = [], [], []
+    for source in sources:
+        text = read(source)
+        if text is None:
+            if source not in VENDOR_ASSETS:
+                raise FileNotFoundError(f"Bundle {name!r}: {source!r} not found")
+            (after if parts else before).append(VENDOR_ASSETS[source]['url'])
+            continue
+        minified = VENDOR_ASSETS.get(source, {}).get('minified', False)
+        if is_css:
+            parts.append(rebase_css_urls(text if minified else minify_css(text), source, target))
+        else:
+            parts.append(text.strip() if minified else minify_js(text))
+    return ('\n' if is_css else ';\n').join(parts) + '\n', before, after
+
+
+# --- critical CSS -------------------------------------------------------------
+
+def css_blocks(css):
+    """Top-level ``(prelude, body)`` pairs of minified ``css``."""
+    i, n = 0, len(css)
+    while i < n:
+        start = css.find('{', i)
+        if start == -1:
+            return
+        depth, j = 1, start + 1
+        while j < n and depth:
+            if css[j] in '"\'':
+                j = _skip_string(css, j)
+                continue
+            depth += {'{': 1, '}': -1}.get(css[j], 0)
+            j += 1
+        yield css[i:start].strip(), css[start + 1:j - 1]
+        i = j
+
+
+FONT_FAMILY_RE = re.compile(r'font-family:([^;}]+)')
+FONT_FACE_FAMILY_RE = re.compile(r'''font-family:\s*['"]?([^;'"}]+)''')
+
+
+def _font_families(rules):
+    families = set()
+    for value in FONT_FAMILY_RE.findall(rules):
+        families.update(part.strip(' \'"').lower() for part in value.split(','))
+    return families
+
+
+def critical_css(css, prefixes):
+    """The rules of minified ``css`` whose selectors start with one of ``prefixes``."""
+    def select(css):
+        kept = []
+        for prelude, body in css_blocks(css):
+            if prelude.startswith('@media') or prelude.startswith('@supports'):
+                inner = select(body)
+                if inner:
+                    kept.append(f'{prelude}{{{inner}}}')
+            elif not prelude.startswith('@') and any(
+                selector.strip().startswith(prefixes) for selector in prelude.split(',')
+            ):
+                kept.append(f'{prelude}{{{body}}}')
+        return ''.join(kept)
+
+    rules = select(css)
+    families = _font_families(rules)
+    extra = []
+    for prelude, body in css_blocks(css):
+        if prelude == '@font-face':
+            match = FONT_FACE_FAMILY_RE.search(body)
+            if match and match.group(1).strip().lower() in families:
+                extra.append(f'{prelude}{{{body}}}')
+        elif prelude.startswith('@keyframes') and re.search(
+            rf'\b{re.escape(prelude.split()[-1])}\b', rules
+        ):
+            extra.append(f'{prelude}{{{body}}}')
+    return ''.join(extra) + rules
+
+
+def resolve_css_urls(css, base_url):
+    """Make ``css``'s relative ``url()``s absolute against ``base_url`` (for inlining)."""
+    def resolve(match):
+        quote, url = match.groups()
+        if url.startswith(('#', 'data:')):
+            return match.group(0)
+        return f'url({quote}{urljoin(base_url, url)}{quote})'
+
+    return CSS_URL_RE.sub(resolve, css)
+
+
+@functools.lru_cache(maxsize=None)
+def bundle_manifest():
+    """The collected ``asset-bundles.json`` (empty without collectstatic)."""
+    try:
+        with staticfiles_storage.open(BUNDLE_MANIFEST) as f:
+            return json.loads(f.read().decode()).get('bundles', {})
+    except (OSError, ValueError):
+        return {}
+
+
+@functools.lru_cache(maxsize=None)
+def critical_text(path):
+    """Collected critical CSS ``path``, ready to inline in a ``<style>``."""
+    with staticfiles_storage.open(staticfiles_storage.stored_name(path)) as f:
+        css = f.read().decode()
+    return resolve_css_urls(css, static(path)).replace('</', '<\\/')
+
+
+@checks.register(checks.Tags.staticfiles, deploy=True)
+def check_vendored_assets(app_configs, **kwargs):
+    missing = [name for name in VENDOR_ASSETS if not finders.find(name)]
+    if not missing:
+        return []
+    return [checks.Warning(
+        f"{len(missing)} third-party assets are not vendored and will load from their CDNs: "
+        + ', '.join(missing),
+        hint="Run `manage.py vendor_assets` and commit main/static/vendor.",
+        id='main.W001',
+    )]
@@ -0,0 +1,81 @@
+"""
+Helpers for the async views in main/views.py.
+
+Under ASGI the login, register, contact and profile views run on the event
+loop. Anything that would block it goes elsewhere:
+
+* database and session access that has to stay on Django's sync thread goes
+  through ``sync_to_async`` (``aload_user``, ``alogin``, ``arender``);
+* password hashing runs on the bounded ``HASHING_POOL`` (main/hashing.py)
+  and Pillow work on ``IMAGE_EXECUTOR``, so a burst of logins or uploads can
+  only occupy that many threads.
+
+Django 4.1 has no async ``login_required``/``csrf_protect``, so the async
+equivalents live here too. Under WSGI the same views still work; Django runs
+each one in its own event loop.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import authenticate, login
+from django.contrib.auth.views import redirect_to_login
+from django.middleware.csrf import CsrfViewMiddleware
+from django.shortcuts import render, resolve_url
+
+from .hashing import HASHING_POOL
+
+IMAGE_EXECUTOR = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'IMAGE_EXECUTOR_WORKERS', 2),
+    thread_name_prefix='image',
+)
+
+
+async def run_in_executor(executor, func, *args, **kwargs):
+    """Await ``func(*args, **kwargs)`` running on ``executor``."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+
+async def aload_user(request):
+    """Resolve the lazy ``request.user`` (a session + user query) off the event loop."""
+    await sync_to_async(lambda: request.user.is_authenticated)()
+    return request.user
+
+
+async def aauthenticate(request, **credentials):
+    """
+    ``authenticate()`` on the hashing pool; checking the password is the slow
+    part. Raises ``PoolSaturated`` when the pool is full.
+    """
+    return await HASHING_POOL.arun(authenticate, request, **credentials)
+
+
+alogin = sync_to_async(login)
+arender = sync_to_async(render)
+
+_csrf_middleware = CsrfViewMiddleware(lambda request: None)
+
+
+async def acsrf_check(request):
+    """Run the CSRF check for a view marked ``csrf_exempt``; returns a 403 response or None."""
+    return await sync_to_async(_csrf_middleware.process_view)(request, None, (), {})
+
+
+def async_login_required(view_func=None, login_url=None):
+    """``login_required`` for coroutine views."""
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        async def _wrapped_view(request, *args, **kwargs):
+            user = await aload_user(request)
+            if user.is_authenticated:
+                return await view_func(request, *args, **kwargs)
+            return redirect_to_login(request.get_full_path(), resolve_url(login_url or settings.LOGIN_URL))
+        return _wrapped_view
+
+    if view_func is not None:
+        return decorator(view_func)
+    return decorator
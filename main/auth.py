@@ -0,0 +1,67 @@
+"""
+Loading the session user together with their profile.
+
+``ProfileModelBackend.get_user`` (called once per request by
+``AuthenticationMiddleware``, which memoizes the result on ``request.user``)
+fetches the ``User`` with ``select_related('profile')``, so
+``request.user.profile`` in views and templates costs no further query.
+
+With ``USER_PROFILE_CACHE = True`` the loaded pair is also kept in the
+default cache for ``USER_PROFILE_CACHE_TIMEOUT`` seconds, so an
+authenticated page view needs no identity query at all. Saving or deleting
+the user or profile drops the entry (see main/signals.py); ``forget_user``
+does the same for code that updates rows with ``QuerySet.update()``. The
+cache must be shared by all workers (settings.py requires ``REDIS_URL``).
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+
+CACHE_KEY = 'auth-user:{}'
+
+
+def _cache_enabled():
+    return getattr(settings, 'USER_PROFILE_CACHE', False)
+
+
+def load_user(user_id):
+    """The user with ``user_id`` and their profile (if any), or None."""
+    key = CACHE_KEY.format(user_id)
+    if _cache_enabled():
+        user = cache.get(key)
+        if user is not None:
+            return user
+
+    UserModel = get_user_model()
+    try:
+        user = UserModel._default_manager.select_related('profile').get(pk=user_id)
+    except UserModel.DoesNotExist:
+        return None
+    if _cache_enabled():
+        # Pickled with the profile in its related-object cache.
+        cache.set(key, user, getattr(settings, 'USER_PROFILE_CACHE_TIMEOUT', 300))
+    return user
+
+
+def forget_user(user_id):
+    if _cache_enabled() and user_id is not None:
+        cache.delete(CACHE_KEY.format(user_id))
+
+
+class ProfileModelBackend(ModelBackend):
+    """``ModelBackend`` whose ``get_user`` also loads the profile, in the same query."""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        user = super().authenticate(request, username=username, password=password, **kwargs)
+        if user is None and password is not None:
+            # Stop authenticate() here: ModelBackend, listed next for the sessions
+            # it issued, would hash the same wrong password a second time.
+            raise PermissionDenied
+        return user
+
+    def get_user(self, user_id):
+        user = load_user(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
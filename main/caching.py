@@ -0,0 +1,137 @@
+"""
+Response and fragment caching for pages that look the same to every
+anonymous visitor (home, services, the contact form).
+
+``cache_anonymous_page`` serves a stored copy to requests without a session
+or messages cookie and renders normally for everyone else. Responses carry
+``Vary: Cookie`` so shared caches in front of us keep the two apart. The
+contact form's CSRF token is swapped for a fresh one on every hit, so a
+cached page never hands out someone else's token.
+
+Cached pages and ``{% cache ... using='pages' %}`` fragments live in the
+``pages`` cache, whose keys include a hash of the static files manifest:
+a deploy that changes any static file starts from an empty cache.
+"""
+
+import asyncio
+import functools
+import hashlib
+import os
+import re
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.cache import patch_vary_headers
+from django.utils.encoding import iri_to_uri
+
+PAGE_CACHE = 'pages'
+CSRF_INPUT_RE = re.compile(rb'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+
+
+@functools.lru_cache(maxsize=None)
+def static_manifest_version():
+    """Short hash of ``staticfiles.json``; read once per process (deploys restart workers)."""
+    path = os.path.join(settings.STATIC_ROOT, 'staticfiles.json')
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()[:12]
+    except OSError:
+        return 'dev'
+
+
+def make_page_key(key, key_prefix, version):
+    """KEY_FUNCTION for the ``pages`` cache."""
+    return f'{key_prefix}:{static_manifest_version()}:{version}:{key}'
+
+
+def _cacheable_request(request):
+    return (
+        request.method in ('GET', 'HEAD')
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        and 'messages' not in request.COOKIES
+    )
+
+
+def _cacheable_response(response):
+    cookies = set(response.cookies) - {settings.CSRF_COOKIE_NAME}
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not cookies
+        and 'private' not in response.get('Cache-Control', '')
+    )
+
+
+def _page_key(request):
+    return f'page:{request.get_host()}:{iri_to_uri(request.get_full_path())}'
+
+
+def _from_cache(request, cached):
+    content, content_type = cached
+    if b'csrfmiddlewaretoken' in content:
+        # get_token() also makes CsrfViewMiddleware send a matching cookie.
+        token = get_token(request).encode('ascii')
+        content = CSRF_INPUT_RE.sub(lambda match: match.group(1) + token + match.group(2), content)
+    response = HttpResponse(content, content_type=content_type)
+    response['X-Page-Cache'] = 'hit'
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def _to_cache(request, response):
+    patch_vary_headers(response, ('Cookie',))
+    if not _cacheable_response(response):
+        return None
+    if hasattr(response, 'render') and callable(response.render):
+        response.render()
+    response['X-Page-Cache'] = 'miss'
+    return (response.content, response['Content-Type'])
+
+
+def cache_anonymous_page(view_func=None, timeout=None):
+    """Cache ``view_func``'s response for anonymous visitors (sync and async views)."""
+    def decorator(view_func):
+        def page_timeout():
+            return timeout if timeout is not None else getattr(settings, 'PAGE_CACHE_TIMEOUT', 300)
+
+        if asyncio.iscoroutinefunction(view_func):
+            @functools.wraps(view_func)
+            async def _wrapped_view(request, *args, **kwargs):
+                if not _cacheable_request(request):
+                    response = await view_func(request, *args, **kwargs)
+                    patch_vary_headers(response, ('Cookie',))
+                    return response
+                cache = caches[PAGE_CACHE]
+                key = _page_key(request)
+                cached = await cache.aget(key)
+                if cached is not None:
+                    return _from_cache(request, cached)
+                response = await view_func(request, *args, **kwargs)
+                stored = _to_cache(request, response)
+                if stored is not None:
+                    await cache.aset(key, stored, page_timeout())
+                return response
+        else:
+            @functools.wraps(view_func)
+            def _wrapped_view(request, *args, **kwargs):
+                if not _cacheable_request(request):
+                    response = view_func(request, *args, **kwargs)
+                    patch_vary_headers(response, ('Cookie',))
+                    return response
+                cache = caches[PAGE_CACHE]
+                key = _page_key(request)
+                cached = cache.get(key)
+                if cached is not None:
+                    return _from_cache(request, cached)
+                response = view_func(request, *args, **kwargs)
+                stored = _to_cache(request, response)
+                if stored is not None:
+                    cache.set(key, stored, page_timeout())
+                return response
+        return _wrapped_view
+
+    if view_func is not None:
+        return decorator(view_func)
+    return decorator
@@ -0,0 +1,186 @@
+"""
+Dropping repeated contact form submissions.
+
+A submission's fingerprint is the SHA-256 of its email and message with case
+and whitespace normalised, so cosmetic variations still collide. Repeats
+within ``CONTACT_DEDUP_WINDOW`` seconds of the stored copy are dropped:
+
+* a per-process Bloom filter answers "definitely new" without touching the
+  database (the common case for genuine messages);
+* when it says "maybe", an LRU of recent fingerprints decides, and only if
+  the LRU has forgotten it is the database asked (``fingerprint`` index);
+* the background flush (main/ingest.py) drops copies that reached different
+  worker processes, with one query per batch.
+
+The Bloom filter is two generations of ``CONTACT_DEDUP_WINDOW`` seconds each,
+rotated as they age, so it never fills up. Only stored submissions are
+remembered (``remember()``): a submission that failed to save can be retried.
+"""
+
+import base64
+import hashlib
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from .metrics import Counter
+
+WHITESPACE_RE = re.compile(r'\s+')
+
+DUPLICATES_DROPPED = Counter(
+    'payantech_contact_duplicates_dropped_total', "Repeated contact submissions that were not stored"
+)
+
+
+def normalize_message(message):
+    return WHITESPACE_RE.sub(' ', (message or '').casefold()).strip()
+
+
+def contact_fingerprint(email, message):
+    normalized = f"{(email or '').strip().lower()}\0{normalize_message(message)}"
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.01):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, fingerprint):
+        # Double hashing over two 64-bit halves of the (already uniform) digest.
+        h1 = int(fingerprint[:16], 16)
+        h2 = int(fingerprint[16:32], 16) | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, fingerprint):
+        for position in self._positions(fingerprint):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, fingerprint):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(fingerprint))
+
+    def to_dict(self):
+        return {'size': self.size, 'hashes': self.hashes, 'bits': base64.b64encode(self.bits).decode('ascii')}
+
+    @classmethod
+    def from_dict(cls, data):
+        bloom = cls.__new__(cls)
+        bloom.size = data['size']
+        bloom.hashes = data['hashes']
+        bloom.bits = bytearray(base64.b64decode(data['bits']))
+        return bloom
+
+
+class SubmissionDeduplicator:
+    def __init__(self, window, capacity, lru_size):
+        self.window = window
+        self.capacity = capacity
+        self.lru_size = lru_size
+        self._lock = threading.Lock()
+        self._recent = OrderedDict()
+        self._current = BloomFilter(capacity)
+        self._previous = BloomFilter(capacity)
+        self._rotated_at = time.monotonic()
+
+    def _rotate(self, now):
+        if now - self._rotated_at >= self.window:
+            self._previous, self._current = self._current, BloomFilter(self.capacity)
+            self._rotated_at = now
+
+    def seen(self, fingerprint):
+        """
+        True if ``fingerprint`` was stored within the window, False if it
+        definitely wasn't, or None if only the database can tell.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._rotate(now)
+            maybe_seen = fingerprint in self._current or fingerprint in self._previous
+            last_seen = self._recent.get(fingerprint)
+
+        if last_seen is not None:
+            return now - last_seen < self.window
+        return None if maybe_seen else False
+
+    def remember(self, fingerprint):
+        """Record ``fingerprint`` once its submission is stored (or spooled)."""
+        if not self.window:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._rotate(now)
+            self._recent.pop(fingerprint, None)
+            self._recent[fingerprint] = now
+            if len(self._recent) > self.lru_size:
+                self._recent.popitem(last=False)
+            self._current.add(fingerprint)
+
+    def recently_stored(self, fingerprint):
+        from .models import ContactMessage
+
+        since = timezone.now() - timedelta(seconds=self.window)
+        return ContactMessage.objects.filter(fingerprint=fingerprint, submitted_at__gte=since).exists()
+
+    def is_duplicate(self, fingerprint):
+        if not self.window:
+            return False
+        seen = self.seen(fingerprint)
+        if seen is None:
+            seen = self.recently_stored(fingerprint)
+        if seen:
+            DUPLICATES_DROPPED.inc()
+        return seen
+
+    async def ais_duplicate(self, fingerprint):
+        if not self.window:
+            return False
+        seen = self.seen(fingerprint)
+        if seen is None:
+            seen = await sync_to_async(self.recently_stored)(fingerprint)
+        if seen:
+            DUPLICATES_DROPPED.inc()
+        return seen
+
+
+def drop_stored_duplicates(records, window):
+    """
+    Filter ``records`` (dicts with ``fingerprint`` and a ``submitted_at``
+    datetime) down to those not repeated within the batch or already stored
+    within ``window`` seconds. One query for the whole batch.
+    """
+    from .models import ContactMessage
+
+    fingerprints = {record['fingerprint'] for record in records if record.get('fingerprint')}
+    if not window or not fingerprints:
+        return records
+    since = min(record['submitted_at'] for record in records) - timedelta(seconds=window)
+    seen = set(
+        ContactMessage.objects.filter(fingerprint__in=fingerprints, submitted_at__gte=since)
+        .values_list('fingerprint', flat=True)
+    )
+    kept = []
+    for record in records:
+        fingerprint = record.get('fingerprint')
+        if fingerprint:
+            if fingerprint in seen:
+                continue
+            seen.add(fingerprint)
+        kept.append(record)
+    if len(kept) < len(records):
+        DUPLICATES_DROPPED.inc(len(records) - len(kept))
+    return kept
+
+
+CONTACT_DEDUP = SubmissionDeduplicator(
+    window=getattr(settings, 'CONTACT_DEDUP_WINDOW', 3600),
+    capacity=getattr(settings, 'CONTACT_DEDUP_BLOOM_CAPACITY', 100000),
+    lru_size=getattr(settings, 'CONTACT_DEDUP_LRU_SIZE', 10000),
+)
@@ -0,0 +1,141 @@
+"""
+Streaming exports of contact messages as CSV or NDJSON.
+
+Rows are read with ``.iterator(chunk_size=...)`` and written out as they
+arrive, so memory use doesn't grow with the table. ``export_response()``
+serves an export over HTTP (the admin actions) and ``write_export()`` writes
+one to a (optionally gzipped) file (``manage.py export_contact_messages``).
+"""
+
+import csv
+import json
+import queue
+import threading
+
+from django.db import connections
+from django.http import StreamingHttpResponse
+
+EXPORT_FIELDS = ('id', 'name', 'email', 'phone', 'message', 'submitted_at')
+CHUNK_SIZE = 2000
+# HTTP exports send pieces of about this many characters rather than one
+# message per row.
+BUFFER_SIZE = 64 * 1024
+
+
+class Echo:
+    """File-like object whose ``write`` hands back the value, for ``csv.writer``."""
+
+    def write(self, value):
+        return value
+
+
+def filter_submitted(queryset, since=None, until=None):
+    """Restrict to ``since <= submitted_at < until`` (either bound optional)."""
+    if since is not None:
+        queryset = queryset.filter(submitted_at__gte=since)
+    if until is not None:
+        queryset = queryset.filter(submitted_at__lt=until)
+    return queryset
+
+
+def _rows(queryset, chunk_size):
+    for row in queryset.order_by('pk').values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size):
+        yield [value.isoformat() if hasattr(value, 'isoformat') else value for value in row]
+
+
+def iter_csv(queryset, chunk_size=CHUNK_SIZE):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in _rows(queryset, chunk_size):
+        yield writer.writerow(row)
+
+
+def iter_ndjson(queryset, chunk_size=CHUNK_SIZE):
+    for row in _rows(queryset, chunk_size):
+        yield json.dumps(dict(zip(EXPORT_FIELDS, row))) + '\n'
+
+
+FORMATS = {
+    'csv': (iter_csv, 'text/csv; charset=utf-8'),
+    'ndjson': (iter_ndjson, 'application/x-ndjson'),
+}
+
+
+def iter_export(queryset, fmt, chunk_size=CHUNK_SIZE):
+    """Yield the export as strings of roughly ``BUFFER_SIZE`` characters."""
+    iter_lines = FORMATS[fmt][0]
+    buffer, size = [], 0
+    for line in iter_lines(queryset, chunk_size):
+        buffer.append(line)
+        size += len(line)
+        if size >= BUFFER_SIZE:
+            yield ''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def iter_in_thread(make_iterator, maxsize=4):
+    """
+    Run ``make_iterator()`` on its own thread and yield what it produces.
+
+    Under ASGI a streaming body is consumed on the event loop, where Django
+    refuses to run queries. The producer blocks once ``maxsize`` pieces are
+    waiting, so a slow client can't make it read ahead of what was sent.
+    """
+    pieces = queue.Queue(maxsize)
+    stopped = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                pieces.put(item, timeout=1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for piece in make_iterator():
+                if not put(piece):
+                    return
+        except Exception as exc:
+            put(exc)
+        finally:
+            # This thread's own connection, not the request's.
+            connections.close_all()
+            put(done)
+
+    threading.Thread(target=produce, name='export', daemon=True).start()
+    try:
+        while True:
+            piece = pieces.get()
+            if piece is done:
+                return
+            if isinstance(piece, Exception):
+                raise piece
+            yield piece
+    finally:
+        # The client went away (or we finished): let the producer exit.
+        stopped.set()
+
+
+def export_response(queryset, fmt, filename, chunk_size=CHUNK_SIZE):
+    response = StreamingHttpResponse(
+        iter_in_thread(lambda: iter_export(queryset, fmt, chunk_size)),
+        content_type=FORMATS[fmt][1],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
+
+
+def write_export(queryset, fmt, stream, chunk_size=CHUNK_SIZE):
+    """Write the export to the text stream ``stream``; returns the number of rows."""
+    iter_lines = FORMATS[fmt][0]
+    lines = 0
+    for lines, line in enumerate(iter_lines(queryset, chunk_size), 1):
+        stream.write(line)
+    # The CSV header line isn't a row.
+    return lines - 1 if fmt == 'csv' and lines else lines
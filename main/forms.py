@@ -0,0 +1,11 @@
+from django import forms
+
+from .models import ContactMessage
+
+
+class ContactMessageForm(forms.ModelForm):
+    """The contact form; checked before a submission is spooled (main/ingest.py)."""
+
+    class Meta:
+        model = ContactMessage
+        fields = ('name', 'email', 'phone', 'message')
@@ -0,0 +1,94 @@
+"""
+Bounded thread pool for password hashing.
+
+PBKDF2 with hundreds of thousands of iterations is the most expensive thing
+login and register do. Running it here caps how many hashes a worker process
+computes at once (``PASSWORD_HASHING_WORKERS``) and how many more may wait
+(``PASSWORD_HASHING_QUEUE_SIZE``). Beyond that ``PoolSaturated`` is raised
+immediately so the view can answer 503 instead of queueing, and the rest of
+the site keeps its threads during a login spike or credential stuffing.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .metrics import Counter, Gauge, Summary
+
+
+class PoolSaturated(Exception):
+    """Raised when the hashing pool and its wait queue are both full."""
+
+
+class HashingPool:
+    def __init__(self, workers, queue_size, name='password_hash'):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='hashing')
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+
+        prefix = f'payantech_{name}'
+        Gauge(f'{prefix}_queue_depth', "Hash jobs waiting for a worker", lambda: self.queue_depth)
+        Gauge(f'{prefix}_in_flight', "Hash jobs being computed", lambda: self._running)
+        self.wait_seconds = Summary(f'{prefix}_wait_seconds', "Time hash jobs spent queued")
+        self.run_seconds = Summary(f'{prefix}_run_seconds', "Time spent computing hashes")
+        self.completed = Counter(f'{prefix}_completed_total', "Hash jobs completed")
+        self.rejected = Counter(f'{prefix}_rejected_total', "Hash jobs rejected because the queue was full")
+
+    @property
+    def queue_depth(self):
+        return max(self._pending - self._running, 0)
+
+    def submit(self, func, *args, **kwargs):
+        """Schedule ``func`` and return its Future, or raise ``PoolSaturated``."""
+        with self._lock:
+            if self._pending >= self.workers + self.queue_size:
+                self.rejected.inc()
+                raise PoolSaturated()
+            self._pending += 1
+        enqueued = time.monotonic()
+
+        def job():
+            started = time.monotonic()
+            self.wait_seconds.observe(started - enqueued)
+            with self._lock:
+                self._running += 1
+            # The threads outlive requests; jobs that query (authenticate()) get
+            # a connection the way a request does, and give it back.
+            close_old_connections()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                close_old_connections()
+                with self._lock:
+                    self._running -= 1
+                    self._pending -= 1
+                self.run_seconds.observe(time.monotonic() - started)
+                self.completed.inc()
+
+        try:
+            return self._executor.submit(job)
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+
+    def run(self, func, *args, **kwargs):
+        """Run ``func`` on the pool and wait for it (for sync callers)."""
+        return self.submit(func, *args, **kwargs).result()
+
+    async def arun(self, func, *args, **kwargs):
+        """Run ``func`` on the pool and await it (for async views)."""
+        return await asyncio.wrap_future(self.submit(func, *args, **kwargs))
+
+
+HASHING_POOL = HashingPool(
+    workers=getattr(settings, 'PASSWORD_HASHING_WORKERS', 4),
+    queue_size=getattr(settings, 'PASSWORD_HASHING_QUEUE_SIZE', 32),
+)
@@ -0,0 +1,254 @@
+"""
+Write-behind ingestion for contact form submissions.
+
+``CONTACT_BUFFER.submit()`` appends the submission to a local spool file and
+returns immediately; a background thread inserts the buffered rows with one
+``bulk_create`` every ``CONTACT_INGEST_BATCH_SIZE`` submissions or
+``CONTACT_INGEST_FLUSH_INTERVAL`` seconds, whichever comes first.
+
+Durability: every process appends to its own spool segment
+(``CONTACT_INGEST_SPOOL_DIR/contact-*.ndjson``) and holds an exclusive lock
+on it. A segment is deleted only after its rows are committed. Segments that
+nobody holds a lock on - left behind by a crashed worker or a failed flush -
+are replayed by any running buffer (and by ``manage.py flush_contact_spool``),
+so a crash can at worst insert a batch twice (only rows without a
+fingerprint, see main/dedup.py), never lose it.
+
+The view validates submissions before they are spooled. Should a row still
+be refused by the database, the batch is inserted row by row and the
+refused rows are moved to ``quarantine/`` in the spool directory for a
+person to look at, so one bad row neither holds back nor loses the rest.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.files import locks
+from django.db import DataError, IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .metrics import Counter, Gauge, Summary
+
+logger = logging.getLogger(__name__)
+
+CONTACT_FIELDS = ('name', 'email', 'phone', 'message', 'fingerprint')
+# Replay other segments every this many flush cycles.
+REPLAY_EVERY = 30
+
+
+class ContactMessageBuffer:
+    def __init__(self, spool_dir, batch_size, flush_interval, fsync=False):
+        self.spool_dir = str(spool_dir)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pid = None
+        self._pending = []
+        self._segment = None
+
+        Gauge('payantech_contact_buffer_pending', "Contact submissions waiting to be flushed",
+              lambda: len(self._pending))
+        self.batch_sizes = Summary('payantech_contact_flush_batch_size', "Rows per contact flush")
+        self.flush_seconds = Summary('payantech_contact_flush_seconds', "Time taken by contact flushes")
+        self.flushed = Counter('payantech_contact_flushed_total', "Contact submissions written to the database")
+        self.failures = Counter('payantech_contact_flush_failures_total', "Contact flushes that failed")
+
+    # -- request path -----------------------------------------------------
+
+    def submit(self, **fields):
+        """Accept one submission; durable in the spool once this returns."""
+        record = {name: fields.get(name) for name in CONTACT_FIELDS}
+        record['submitted_at'] = timezone.now().isoformat()
+        line = json.dumps(record) + '\n'
+        with self._lock:
+            self._ensure_started()
+            self._segment.write(line)
+            self._segment.flush()
+            if self.fsync:
+                os.fsync(self._segment.fileno())
+            self._pending.append(record)
+            if len(self._pending) >= self.batch_size:
+                self._wakeup.set()
+
+    # -- background flushing ----------------------------------------------
+
+    def _ensure_started(self):
+        # Lazily, and again after a fork: threads and locks don't survive it.
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._pending = []
+        self._segment = self._open_segment()
+        threading.Thread(target=self._run, name='contact-flusher', daemon=True).start()
+        atexit.register(self.shutdown)
+
+    def _open_segment(self):
+        os.makedirs(self.spool_dir, exist_ok=True)
+        path = os.path.join(self.spool_dir, f'contact-{os.getpid()}-{uuid.uuid4().hex}.ndjson')
+        segment = open(path, 'a', encoding='utf-8')
+        locks.lock(segment, locks.LOCK_EX)
+        return segment
+
+    def _run(self):
+        cycles = 0
+        self.replay()
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+            cycles += 1
+            if cycles % REPLAY_EVERY == 0:
+                self.replay()
+
+    def flush(self):
+        """Insert everything buffered so far; the spool segment goes once committed."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending or self._pid != os.getpid():
+                    return
+                batch, self._pending = self._pending, []
+                segment, self._segment = self._segment, self._open_segment()
+
+            started = time.monotonic()
+            try:
+                close_old_connections()
+                inserted = insert_records(batch, self.spool_dir)
+            except Exception:
+                # Leave the segment on disk; replay() will pick it up.
+                self.failures.inc()
+                logger.exception("Flushing %d contact messages failed", len(batch))
+            else:
+                os.remove(segment.name)
+                self.flushed.inc(inserted)
+                self.batch_sizes.observe(len(batch))
+                self.flush_seconds.observe(time.monotonic() - started)
+            finally:
+                locks.unlock(segment)
+                segment.close()
+
+    def shutdown(self):
+        """Flush on interpreter exit and drop our (then empty) segment."""
+        self.flush()
+        with self._lock:
+            if self._segment is None or self._pid != os.getpid() or self._pending:
+                return
+            os.remove(self._segment.name)
+            locks.unlock(self._segment)
+            self._segment.close()
+            self._segment = None
+
+    def replay(self):
+        """Insert and remove any spool segment no live buffer holds."""
+        try:
+            replay_spool(self.spool_dir)
+        except Exception:
+            logger.exception("Replaying the contact spool failed")
+
+
+QUARANTINED = Counter(
+    'payantech_contact_quarantined_total', "Contact submissions the database refused, kept in the spool's quarantine/"
+)
+
+
+def insert_records(records, spool_dir):
+    """Insert spooled ``records``; returns how many were stored."""
+    from .dedup import drop_stored_duplicates
+    from .models import ContactMessage
+
+    records = [
+        dict(record, submitted_at=parse_datetime(record['submitted_at']) or timezone.now())
+        for record in records
+    ]
+    # Copies of one submission that went to different workers, and a batch
+    # replayed after it was committed, are dropped here.
+    records = drop_stored_duplicates(records, getattr(settings, 'CONTACT_DEDUP_WINDOW', 3600))
+
+    def message(record):
+        return ContactMessage(
+            submitted_at=record['submitted_at'],
+            **{name: record.get(name) for name in CONTACT_FIELDS},
+        )
+
+    try:
+        with transaction.atomic():
+            ContactMessage.objects.bulk_create([message(record) for record in records], batch_size=500)
+        return len(records)
+    except (IntegrityError, DataError):
+        # A refused row; anything else (the database being down) keeps the segment for later.
+        logger.warning("Bulk insert of %d contact messages failed; inserting one by one", len(records), exc_info=True)
+
+    refused = []
+    for record in records:
+        try:
+            with transaction.atomic():
+                message(record).save(force_insert=True)
+        except (IntegrityError, DataError):
+            refused.append(record)
+    if refused:
+        quarantine(refused, spool_dir)
+    return len(records) - len(refused)
+
+
+def quarantine(records, spool_dir):
+    directory = os.path.join(spool_dir, 'quarantine')
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'contact-{uuid.uuid4().hex}.ndjson')
+    with open(path, 'w', encoding='utf-8') as quarantined:
+        for record in records:
+            quarantined.write(json.dumps(dict(record, submitted_at=record['submitted_at'].isoformat())) + '\n')
+    QUARANTINED.inc(len(records))
+    logger.error("The database refused %d contact messages; kept in %s", len(records), path)
+
+
+def replay_spool(spool_dir):
+    """Flush orphaned spool segments; returns the number of rows inserted."""
+    if not os.path.isdir(spool_dir):
+        return 0
+    inserted = 0
+    for entry in os.scandir(spool_dir):
+        if not entry.name.endswith('.ndjson'):
+            continue
+        try:
+            segment = open(entry.path, 'r+', encoding='utf-8')
+        except FileNotFoundError:
+            continue
+        with segment:
+            if not locks.lock(segment, locks.LOCK_EX | locks.LOCK_NB):
+                continue  # a live buffer is still writing or flushing it
+            try:
+                if os.fstat(segment.fileno()).st_nlink == 0:
+                    continue  # flushed and removed while we were opening it
+                records = []
+                for line in segment:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        # A torn last line from a crash mid-write.
+                        logger.warning("Skipping unreadable line in %s", entry.path)
+                if records:
+                    inserted += insert_records(records, spool_dir)
+                os.remove(entry.path)
+            except Exception:
+                # Keep it for the next replay, and get on with the others.
+                logger.exception("Replaying contact spool segment %s failed", entry.path)
+            finally:
+                locks.unlock(segment)
+    return inserted
+
+
+CONTACT_BUFFER = ContactMessageBuffer(
+    spool_dir=getattr(settings, 'CONTACT_INGEST_SPOOL_DIR', os.path.join(settings.BASE_DIR, 'var', 'contact_spool')),
+    batch_size=getattr(settings, 'CONTACT_INGEST_BATCH_SIZE', 200),
+    flush_interval=getattr(settings, 'CONTACT_INGEST_FLUSH_INTERVAL', 2.0),
+    fsync=getattr(settings, 'CONTACT_INGEST_FSYNC', False),
+)
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.archive import archive_batch, archive_cutoff, archive_dir
+from main.models import ContactMessage
+
+
+class Command(BaseCommand):
+    help = "Move old contact messages out of the database into gzipped NDJSON segments"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days', type=int, default=None,
+            help="Archive messages submitted more than this many days ago (default: CONTACT_ARCHIVE_AFTER_DAYS)",
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help="Rows archived and deleted per transaction; keeps locks short",
+        )
+        parser.add_argument('--pause', type=float, default=0.0, help="Seconds to sleep between batches")
+        parser.add_argument('--dry-run', action='store_true', help="Only report how many rows would move")
+
+    def handle(self, *args, **options):
+        cutoff = archive_cutoff(options['older_than_days'])
+        old_messages = ContactMessage.objects.filter(submitted_at__lt=cutoff)
+        if options['dry_run']:
+            self.stdout.write(f"{old_messages.count()} contact messages submitted before {cutoff:%Y-%m-%d %H:%M} would be archived")
+            return
+
+        directory = archive_dir()
+        moved = 0
+        started = time.monotonic()
+        while True:
+            # Oldest first, so an interrupted run leaves a clean cutoff behind it.
+            batch = old_messages.order_by('submitted_at', 'id')[:options['batch_size']]
+            count = archive_batch(batch, directory)
+            if not count:
+                break
+            moved += count
+            if options['verbosity'] >= 2:
+                self.stdout.write(f"{moved} archived")
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {moved} contact messages to {directory} in {time.monotonic() - started:.1f}s"
+        ))
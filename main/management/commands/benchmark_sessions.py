@@ -0,0 +1,71 @@
+import random
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the session work of a logged-in request (load, read the auth keys, "
+        "sometimes write a flash message) for each SESSION_MODE"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000, help="Simulated requests per mode")
+        parser.add_argument(
+            '--write-ratio', type=float, default=0.1,
+            help="Share of requests that modify the session (e.g. messages.success)",
+        )
+        parser.add_argument(
+            '--modes', nargs='+', choices=sorted(settings.SESSION_ENGINES),
+            default=list(settings.SESSION_ENGINES),
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        writes = [rng.random() < options['write_ratio'] for _ in range(options['requests'])]
+
+        cached = {'cache', 'cached_db'} & set(options['modes'])
+        if cached and isinstance(caches[settings.SESSION_CACHE_ALIAS], LocMemCache):
+            self.stderr.write(self.style.WARNING(
+                f"No REDIS_URL: {', '.join(sorted(cached))} will use the in-process LocMemCache. "
+                "Those numbers leave out the Redis round trip and are not representative."
+            ))
+        self.stdout.write(f"{'mode':<16}{'us/request':>12}{'queries/request':>18}")
+        for mode in options['modes']:
+            elapsed, queries = self.run_mode(settings.SESSION_ENGINES[mode], writes)
+            self.stdout.write(
+                f"{mode:<16}{elapsed / len(writes) * 1e6:>12.0f}{queries / len(writes):>18.2f}"
+            )
+
+    def run_mode(self, engine, writes):
+        SessionStore = import_module(engine).SessionStore
+
+        session = SessionStore()
+        session['_auth_user_id'] = '1'
+        session['_auth_user_backend'] = settings.AUTHENTICATION_BACKENDS[0]
+        session['_auth_user_hash'] = 'x' * 64
+        session.save()
+        # What the browser would send back: the key, or for signed cookies the data.
+        cookie = session.session_key
+
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            for write in writes:
+                # What SessionMiddleware and the auth lookup do per request.
+                session = SessionStore(cookie)
+                session.get('_auth_user_id')
+                if write:
+                    session['_messages'] = '[["__json_message",0,25,"Profile updated"]]'
+                    session.save()
+                    cookie = session.session_key
+            elapsed = time.perf_counter() - started
+
+        session.delete()
+        return elapsed, len(captured)
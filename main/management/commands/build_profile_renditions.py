@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from main.models import UserProfile
+from main.renditions import update_renditions
+
+
+class Command(BaseCommand):
+    help = "Generate missing or stale profile picture renditions"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help="Check every profile, not just the stale ones: render missing files "
+                 "(e.g. after changing RENDITION_FORMATS) and delete the ones replaced",
+        )
+
+    def handle(self, *args, **options):
+        profiles = UserProfile.objects.exclude(profile_picture='').exclude(profile_picture__isnull=True)
+        done = 0
+        for pk in profiles.values_list('pk', flat=True).iterator():
+            update_renditions(pk, force=options['all'])
+            done += 1
+        self.stdout.write(self.style.SUCCESS(f"Checked renditions for {done} profiles"))
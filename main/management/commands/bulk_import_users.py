@@ -0,0 +1,161 @@
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from main.models import UserProfile
+
+PROFILE_COLUMNS = ('phone', 'bio')
+
+
+def _init_worker():
+    # Needed when the pool spawns rather than forks: make_password reads settings.
+    django.setup()
+
+
+def _hash_passwords(passwords):
+    return [make_password(password or None) for password in passwords]
+
+
+def read_batches(rows, batch_size):
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Create users (and their profiles) from a CSV with columns username, email, "
+        "password and optionally first_name, last_name, phone, bio"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path')
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows per transaction")
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help="Processes used to hash passwords",
+        )
+        parser.add_argument(
+            '--checkpoint', default=None,
+            help="Progress file used to resume (default: <csv_path>.checkpoint)",
+        )
+        parser.add_argument('--restart', action='store_true', help="Ignore an existing checkpoint")
+
+    def handle(self, *args, **options):
+        csv_path = options['csv_path']
+        batch_size = options['batch_size']
+        checkpoint_path = options['checkpoint'] or f'{csv_path}.checkpoint'
+        rows_done = 0 if options['restart'] else self.load_checkpoint(checkpoint_path)
+
+        created = skipped = 0
+        started = time.monotonic()
+        with open(csv_path, newline='', encoding='utf-8-sig') as f:
+            reader = csv.DictReader(f)
+            if not reader.fieldnames or 'username' not in reader.fieldnames:
+                raise CommandError("The CSV needs at least a 'username' column")
+            rows = iter(reader)
+            if rows_done:
+                self.stdout.write(f"Resuming after {rows_done} rows")
+                # Skipping still parses the rows, but nothing is hashed or inserted.
+                for _ in islice(rows, rows_done):
+                    pass
+
+            # Forked workers must not share our database connection.
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+                batches = read_batches(rows, batch_size)
+                batch = next(batches, None)
+                pending = self.submit_hashing(pool, batch, options['workers'])
+                while batch is not None:
+                    # Hash the next batch in the pool while this one is inserted.
+                    next_batch = next(batches, None)
+                    next_pending = self.submit_hashing(pool, next_batch, options['workers'])
+
+                    passwords = [hashed for future in pending for hashed in future.result()]
+                    batch_created, batch_skipped = self.insert_batch(batch, passwords)
+                    created += batch_created
+                    skipped += batch_skipped
+                    rows_done += len(batch)
+                    self.save_checkpoint(checkpoint_path, rows_done)
+
+                    elapsed = time.monotonic() - started
+                    self.stdout.write(
+                        f"{rows_done} rows, {created} created, {skipped} skipped "
+                        f"({(created + skipped) / elapsed:.0f} rows/s)"
+                    )
+                    batch, pending = next_batch, next_pending
+
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {created} users ({skipped} skipped) in {elapsed:.1f}s, "
+            f"{(created + skipped) / max(elapsed, 1e-9):.0f} rows/s"
+        ))
+
+    def submit_hashing(self, pool, batch, workers):
+        if not batch:
+            return []
+        passwords = [row.get('password') for row in batch]
+        chunk = -(-len(passwords) // workers)
+        return [
+            pool.submit(_hash_passwords, passwords[start:start + chunk])
+            for start in range(0, len(passwords), chunk)
+        ]
+
+    def insert_batch(self, batch, passwords):
+        """Insert one batch in a single transaction; returns (created, skipped)."""
+        users = {}
+        for row, password in zip(batch, passwords):
+            username = User.normalize_username((row.get('username') or '').strip())
+            if not username or username in users:
+                continue
+            users[username] = (User(
+                username=username,
+                email=User.objects.normalize_email((row.get('email') or '').strip()),
+                first_name=(row.get('first_name') or '').strip(),
+                last_name=(row.get('last_name') or '').strip(),
+                password=password,
+            ), row)
+
+        with transaction.atomic():
+            # Already present from an earlier (partial) run or another source.
+            existing = set(User.objects.filter(username__in=users).values_list('username', flat=True))
+            new_users = [user for name, (user, _row) in users.items() if name not in existing]
+            # bulk_create sends no post_save, so profiles are created here too.
+            User.objects.bulk_create(new_users)
+            if any(user.pk is None for user in new_users):
+                ids = dict(User.objects.filter(username__in=[u.username for u in new_users]).values_list('username', 'id'))
+                for user in new_users:
+                    user.pk = ids[user.username]
+            UserProfile.objects.bulk_create([
+                UserProfile(user_id=user.pk, **{
+                    column: (users[user.username][1].get(column) or '').strip() or None
+                    for column in PROFILE_COLUMNS
+                })
+                for user in new_users
+            ])
+        return len(new_users), len(batch) - len(new_users)
+
+    def load_checkpoint(self, path):
+        if not os.path.exists(path):
+            return 0
+        with open(path) as f:
+            return json.load(f)['rows_done']
+
+    def save_checkpoint(self, path, rows_done):
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'rows_done': rows_done}, f)
+        os.replace(tmp_path, path)
@@ -0,0 +1,49 @@
+import gzip
+import sys
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from main.export import CHUNK_SIZE, FORMATS, filter_submitted, write_export
+from main.models import ContactMessage
+
+
+def parse_bound(value):
+    """A date (midnight, local time) or a datetime; naive values are local."""
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"Not a date or datetime: {value!r}")
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class Command(BaseCommand):
+    help = "Stream contact messages to a CSV or NDJSON file (gzipped when it ends in .gz)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--output', '-o', default='-', help="File to write, or - for stdout (default)")
+        parser.add_argument('--since', help="Only messages submitted at or after this date/datetime")
+        parser.add_argument('--until', help="Only messages submitted before this date/datetime")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Rows fetched per query")
+
+    def handle(self, *args, **options):
+        queryset = filter_submitted(
+            ContactMessage.objects.all(),
+            since=parse_bound(options['since']) if options['since'] else None,
+            until=parse_bound(options['until']) if options['until'] else None,
+        )
+        output = options['output']
+        if output == '-':
+            rows = write_export(queryset, options['format'], sys.stdout, options['chunk_size'])
+        else:
+            opener = gzip.open if output.endswith('.gz') else open
+            with opener(output, 'wt', encoding='utf-8', newline='') as stream:
+                rows = write_export(queryset, options['format'], stream, options['chunk_size'])
+            self.stdout.write(self.style.SUCCESS(f"Exported {rows} contact messages to {output}"))
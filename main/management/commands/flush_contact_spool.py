@@ -0,0 +1,12 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from main.ingest import replay_spool
+
+
+class Command(BaseCommand):
+    help = "Insert contact submissions left in the spool by stopped or crashed workers"
+
+    def handle(self, *args, **options):
+        inserted = replay_spool(str(settings.CONTACT_INGEST_SPOOL_DIR))
+        self.stdout.write(self.style.SUCCESS(f"Inserted {inserted} contact messages from the spool"))
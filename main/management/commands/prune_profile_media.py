@@ -0,0 +1,201 @@
+import json
+import operator
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import reduce
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from main.models import MediaBlob, UserProfile
+from main.renditions import PICTURE_DIR, RENDITION_DIR, rendition_files, rendition_source_prefixes
+
+QUARANTINE_DIR = '.quarantine'
+# Source prefixes per query: each is one LIKE, OR-ed together.
+PREFIXES_PER_QUERY = 100
+
+
+def referenced_pictures(names):
+    """The picture names in ``names`` that a profile or a live blob uses."""
+    names = set(names)
+    referenced = set(UserProfile.objects.filter(profile_picture__in=names).values_list('profile_picture', flat=True))
+    referenced.update(MediaBlob.objects.filter(name__in=names, ref_count__gt=0).values_list('name', flat=True))
+    return referenced & names
+
+
+def referenced_renditions(names):
+    """
+    The rendition names in ``names`` that a profile records.
+
+    Renditions are listed in JSON, so they are found through the pictures
+    they were rendered from (``rendition_source_prefixes``). A file that
+    isn't named like a rendition is kept.
+    """
+    names = set(names)
+    referenced, prefixes = set(), set()
+    for name in names:
+        source_prefixes = rendition_source_prefixes(name)
+        if source_prefixes:
+            prefixes.update(source_prefixes)
+        else:
+            referenced.add(name)
+    prefixes = sorted(prefixes)
+    for i in range(0, len(prefixes), PREFIXES_PER_QUERY):
+        condition = reduce(
+            operator.or_, (Q(profile_picture__startswith=prefix) for prefix in prefixes[i:i + PREFIXES_PER_QUERY])
+        )
+        for renditions in UserProfile.objects.filter(condition).values_list('profile_picture_renditions', flat=True):
+            referenced.update(rendition_files(renditions))
+    return referenced & names
+
+
+def iter_shards(root):
+    """
+    Directories to scan, in a stable order so a checkpoint can refer to them.
+
+    The top-level directory itself (legacy flat files) comes first, then each
+    hash shard underneath it.
+    """
+    yield ''
+    with os.scandir(root) as entries:
+        subdirs = sorted(entry.name for entry in entries if entry.is_dir(follow_symlinks=False))
+    yield from subdirs
+
+
+def iter_files(path):
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_file(follow_symlinks=False):
+                yield entry
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete (or quarantine) files under MEDIA_ROOT/profile_pics and "
+        "MEDIA_ROOT/profile_renditions that no profile references"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report orphans without touching them")
+        parser.add_argument(
+            '--quarantine', action='store_true',
+            help=f"Move orphans to MEDIA_ROOT/{QUARANTINE_DIR}/ instead of deleting them",
+        )
+        parser.add_argument('--batch-size', type=int, default=5000, help="Rows per database batch")
+        parser.add_argument('--workers', type=int, default=8, help="Parallel delete/move workers")
+        parser.add_argument(
+            '--min-age', type=int, default=3600,
+            help="Skip files modified less than this many seconds ago (uploads in flight)",
+        )
+        parser.add_argument(
+            '--checkpoint', default=None,
+            help="Checkpoint file (default: MEDIA_ROOT/.prune_profile_media.json)",
+        )
+        parser.add_argument('--restart', action='store_true', help="Ignore an existing checkpoint")
+
+    def handle(self, *args, **options):
+        media_root = str(settings.MEDIA_ROOT)
+        self.verbosity = options['verbosity']
+        self.dry_run = options['dry_run']
+        self.quarantine = options['quarantine']
+        if self.dry_run and self.quarantine:
+            raise CommandError("--dry-run and --quarantine are mutually exclusive")
+        checkpoint_path = options['checkpoint'] or os.path.join(media_root, '.prune_profile_media.json')
+        checkpoint = self.load_checkpoint(checkpoint_path, options['restart'] or self.dry_run)
+
+        started = time.monotonic()
+        cutoff = time.time() - options['min_age']
+        totals = {'scanned': 0, 'orphans': 0, 'bytes': 0}
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for directory in (PICTURE_DIR, RENDITION_DIR):
+                root = os.path.join(media_root, directory)
+                if not os.path.isdir(root):
+                    continue
+                for shard in iter_shards(root):
+                    key = f'{directory}/{shard}'
+                    if key in checkpoint['done']:
+                        continue
+                    self.prune_shard(pool, media_root, directory, shard, cutoff, totals, options['batch_size'])
+                    if not self.dry_run:
+                        checkpoint['done'].append(key)
+                        self.save_checkpoint(checkpoint_path, checkpoint)
+
+        if not self.dry_run and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+        action = 'would remove' if self.dry_run else ('quarantined' if self.quarantine else 'deleted')
+        self.stdout.write(self.style.SUCCESS(
+            f"Scanned {totals['scanned']} files, {action} {totals['orphans']} orphans "
+            f"({totals['bytes'] / 1024 / 1024:.1f} MB) in {time.monotonic() - started:.1f}s"
+        ))
+
+    def prune_shard(self, pool, media_root, directory, shard, cutoff, totals, batch_size):
+        path = os.path.join(media_root, directory, shard)
+        candidates = {}
+        for entry in iter_files(path):
+            totals['scanned'] += 1
+            stat = entry.stat(follow_symlinks=False)
+            if stat.st_mtime > cutoff:
+                continue
+            candidates['/'.join(part for part in (directory, shard, entry.name) if part)] = stat.st_size
+            if len(candidates) >= batch_size:
+                self.prune_batch(pool, media_root, directory, candidates, totals)
+                candidates = {}
+        self.prune_batch(pool, media_root, directory, candidates, totals)
+
+    def prune_batch(self, pool, media_root, directory, candidates, totals):
+        """Remove the files in ``candidates`` (name -> size) nothing references."""
+        if not candidates:
+            return
+        # Checked against the database per batch, just before removing, so
+        # a picture re-uploaded while we scan is kept.
+        referenced = (referenced_pictures if directory == PICTURE_DIR else referenced_renditions)(candidates)
+        orphans = sorted(name for name in candidates if name not in referenced)
+        for name in orphans:
+            totals['orphans'] += 1
+            totals['bytes'] += candidates[name]
+            if self.verbosity >= 2:
+                self.stdout.write(f"  orphan: {name}")
+        self.remove(pool, media_root, orphans)
+
+    def remove(self, pool, media_root, names):
+        if self.dry_run or not names:
+            return
+        handler = self.move_to_quarantine if self.quarantine else self.delete_file
+        for name, error in zip(names, pool.map(lambda name: handler(media_root, name), names)):
+            if error:
+                self.stderr.write(f"Could not remove {name}: {error}")
+
+    def delete_file(self, media_root, name):
+        try:
+            os.remove(os.path.join(media_root, name))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            return e
+
+    def move_to_quarantine(self, media_root, name):
+        target = os.path.join(media_root, QUARANTINE_DIR, name)
+        try:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(os.path.join(media_root, name), target)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            return e
+
+    def load_checkpoint(self, path, restart):
+        if not restart and os.path.exists(path):
+            with open(path) as f:
+                checkpoint = json.load(f)
+            self.stdout.write(f"Resuming: {len(checkpoint['done'])} directories already pruned")
+            return checkpoint
+        return {'done': []}
+
+    def save_checkpoint(self, path, checkpoint):
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, path)
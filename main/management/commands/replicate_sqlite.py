@@ -0,0 +1,51 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+
+def is_sqlite(alias):
+    return settings.DATABASES[alias]['ENGINE'] == 'django.db.backends.sqlite3'
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the SQLite database into the SQLite read replicas (DATABASE_REPLICA_URLS), "
+        "to try payantech.db.replicas locally"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0.0,
+            help="Copy again every this many seconds (the replication lag to emulate) until interrupted",
+        )
+
+    def handle(self, *args, **options):
+        if not is_sqlite(DEFAULT_DB_ALIAS):
+            raise CommandError("The default database is not SQLite")
+        replicas = [alias for alias in settings.DATABASE_REPLICAS if is_sqlite(alias)]
+        if not replicas:
+            raise CommandError("No SQLite replicas configured; set DATABASE_REPLICA_URLS")
+
+        while True:
+            started = time.monotonic()
+            source = sqlite3.connect(settings.DATABASES[DEFAULT_DB_ALIAS]['NAME'])
+            try:
+                for alias in replicas:
+                    target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+                    try:
+                        # A consistent snapshot, even while the site writes to the source.
+                        source.backup(target)
+                    finally:
+                        target.close()
+            finally:
+                source.close()
+            if options['verbosity'] >= 2 or not options['interval']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Copied into {', '.join(replicas)} in {time.monotonic() - started:.2f}s"
+                ))
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,92 @@
+import base64
+import hashlib
+import posixpath
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from main.assets import CSS_URL_RE, VENDOR_ASSETS
+
+# Google Fonts only serves WOFF2 to browsers it recognises.
+USER_AGENT = (
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36'
+)
+
+
+def fetch(url):
+    with urlopen(Request(url, headers={'User-Agent': USER_AGENT}), timeout=30) as response:
+        return response.read()
+
+
+def check_integrity(data, integrity):
+    algorithm, _, expected = integrity.partition('-')
+    actual = base64.b64encode(hashlib.new(algorithm, data).digest()).decode()
+    return actual == expected
+
+
+class Command(BaseCommand):
+    help = (
+        "Download the pinned third-party assets (main.assets.VENDOR_ASSETS) into main/static/vendor, "
+        "with the fonts and images their stylesheets reference"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Download files that are already present")
+        parser.add_argument('--check', action='store_true', help="Only list the files that are missing")
+
+    def handle(self, *args, **options):
+        self.root = Path(settings.STATICFILES_DIRS[0])
+        self.verbosity = options['verbosity']
+        missing = [name for name in VENDOR_ASSETS if not (self.root / name).exists()]
+        if options['check']:
+            for name in missing:
+                self.stdout.write(f"missing: {name}")
+            if missing:
+                raise CommandError(f"{len(missing)} vendored assets missing")
+            self.stdout.write(self.style.SUCCESS("All vendored assets present"))
+            return
+
+        names = list(VENDOR_ASSETS) if options['force'] else missing
+        for name in names:
+            asset = VENDOR_ASSETS[name]
+            data = fetch(asset['url'])
+            if 'integrity' in asset and not check_integrity(data, asset['integrity']):
+                raise CommandError(f"{asset['url']} does not match its integrity hash")
+            if name.endswith('.css'):
+                data = self.vendor_css_references(name, asset['url'], data.decode()).encode()
+            self.write(name, data)
+        self.stdout.write(self.style.SUCCESS(f"Vendored {len(names)} assets"))
+
+    def vendor_css_references(self, name, url, css):
+        """Download what ``css`` (fetched from ``url``) points to, next to ``name``; return it rewritten."""
+        directory = posixpath.dirname(name)
+        fetched = {}
+
+        def localize(match):
+            quote, ref = match.groups()
+            if ref.startswith(('#', 'data:')):
+                return match.group(0)
+            source = urljoin(url, ref)
+            if '://' in ref:
+                # Absolute (fonts.gstatic.com): keep the file name, under files/.
+                local = posixpath.join(directory, 'files', posixpath.basename(urlsplit(source).path))
+            else:
+                local = posixpath.normpath(posixpath.join(directory, urlsplit(ref).path))
+            if not local.startswith('vendor/'):
+                raise CommandError(f"{name}: {ref!r} points outside vendor/")
+            if local not in fetched:
+                self.write(local, fetch(source))
+                fetched[local] = True
+            return f'url({quote}{posixpath.relpath(local, directory)}{quote})'
+
+        return CSS_URL_RE.sub(localize, css)
+
+    def write(self, name, data):
+        path = self.root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        if self.verbosity >= 2:
+            self.stdout.write(f"{name} ({len(data)} bytes)")
@@ -0,0 +1,179 @@
+"""
+Serving uploaded media (``MEDIA_ROOT``) in production.
+
+``serve_media`` answers conditional and range requests itself and, when
+``MEDIA_OFFLOAD`` is set, hands the actual transfer to the front proxy:
+
+* ``'nginx'``  -> ``X-Accel-Redirect: <MEDIA_ACCEL_REDIRECT_PREFIX><path>``
+  (needs an ``internal`` location aliasing ``MEDIA_ROOT``)
+* ``'apache'`` -> ``X-Sendfile: <absolute path>`` (mod_xsendfile)
+
+Content-hashed pictures (``profile_pics/ab/<sha256>.jpg``) never change, so
+their hash is the ETag and they are cached for a year as ``immutable``.
+
+Without offloading, WSGI streams the file. Django 4.1's ASGI handler iterates
+a streaming body on the event loop, so there the range is read while the view
+still runs in its thread instead; media is pictures and their renditions,
+capped at ``PROFILE_PICTURE_MAX_SIZE``.
+"""
+
+import mimetypes
+import os
+import posixpath
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+HASHED_NAME_RE = re.compile(r'(?:^|/)[0-9a-f]{2}/(?P<digest>[0-9a-f]{64})\.\w+$')
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+DEFAULT_CACHE_CONTROL = 'public, max-age=3600'
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def media_etag(path, st):
+    """Strong ETag: the content hash when the name carries one, else size + mtime."""
+    match = HASHED_NAME_RE.search(path)
+    if match:
+        return f'"{match.group("digest")}"'
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range ``Range`` header into ``(start, end)`` (inclusive).
+
+    Returns ``None`` when the header should be ignored (missing, malformed or
+    multi-range; the full file is sent) and raises ``ValueError`` when the
+    range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header or '')
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes.
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, end
+
+
+def if_range_matches(request, etag, mtime):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == int(mtime)
+
+
+def iter_file_range(fullpath, start, length):
+    with open(fullpath, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(STREAM_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def read_file_range(fullpath, start, length):
+    with open(fullpath, 'rb') as f:
+        f.seek(start)
+        return f.read(length)
+
+
+def offload_response(path, fullpath):
+    offload = getattr(settings, 'MEDIA_OFFLOAD', None)
+    if offload == 'nginx':
+        response = HttpResponse()
+        prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = prefix + quote(path)
+        return response
+    if offload == 'apache':
+        response = HttpResponse()
+        response['X-Sendfile'] = fullpath
+        return response
+    return None
+
+
+@require_safe
+def serve_media(request, path):
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+        st = os.stat(fullpath)
+    except (SuspiciousFileOperation, OSError, ValueError):
+        raise Http404("Media file not found")
+    if not stat.S_ISREG(st.st_mode) or any(part.startswith('.') for part in path.split('/')):
+        raise Http404("Media file not found")
+
+    etag = media_etag(path, st)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(st.st_mtime),
+        'Cache-Control': IMMUTABLE_CACHE_CONTROL if HASHED_NAME_RE.search(path) else DEFAULT_CACHE_CONTROL,
+    }
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(st.st_mtime))
+    if not_modified is not None:
+        for header, value in headers.items():
+            not_modified[header] = value
+        return not_modified
+
+    content_type, encoding = mimetypes.guess_type(fullpath)
+    content_type = content_type or 'application/octet-stream'
+
+    response = offload_response(path, fullpath)
+    if response is not None:
+        # The proxy streams the body and deals with Range itself.
+        response['Content-Type'] = content_type
+    else:
+        try:
+            byte_range = None
+            if if_range_matches(request, etag, st.st_mtime):
+                byte_range = parse_range(request.META.get('HTTP_RANGE'), st.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{st.st_size}'
+            return response
+
+        start, end = byte_range or (0, st.st_size - 1)
+        length = end - start + 1 if st.st_size else 0
+        status = 206 if byte_range else 200
+        if isinstance(request, ASGIRequest):
+            content = b'' if request.method == 'HEAD' else read_file_range(fullpath, start, length)
+            response = HttpResponse(content, status=status, content_type=content_type)
+        else:
+            response = StreamingHttpResponse(
+                iter_file_range(fullpath, start, length), status=status, content_type=content_type,
+            )
+        response['Content-Length'] = str(length)
+        if byte_range:
+            response['Content-Range'] = f'bytes {start}-{end}/{st.st_size}'
+
+    response['Accept-Ranges'] = 'bytes'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    for header, value in headers.items():
+        response[header] = value
+    return response
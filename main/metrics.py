@@ -0,0 +1,104 @@
+"""
+In-process counters exported in the Prometheus text format at ``/metrics/``.
+
+Each gunicorn/uvicorn worker keeps its own values; scrape every worker (or
+sum across them) to see the whole box. Reads are restricted to
+``METRICS_ALLOWED_IPS`` and staff users.
+"""
+
+import abc
+import threading
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+_lock = threading.Lock()
+REGISTRY = []
+
+
+class Metric(abc.ABC):
+    """A named metric in ``REGISTRY``; subclasses set ``type`` and ``samples()``."""
+    type = None
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        REGISTRY.append(self)
+
+    @abc.abstractmethod
+    def samples(self):
+        """Yield ``(sample name, value)`` pairs."""
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        lines.extend(f'{name} {value}' for name, value in self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    """Monotonically increasing total."""
+    type = 'counter'
+
+    def __init__(self, name, documentation):
+        super().__init__(name, documentation)
+        self.value = 0
+
+    def inc(self, amount=1):
+        with _lock:
+            self.value += amount
+
+    def samples(self):
+        yield self.name, self.value
+
+
+class Gauge(Metric):
+    """Current value, either set directly or read from ``function`` at scrape time."""
+    type = 'gauge'
+
+    def __init__(self, name, documentation, function=None):
+        super().__init__(name, documentation)
+        self.value = 0
+        self.function = function
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        with _lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def samples(self):
+        yield self.name, self.function() if self.function else self.value
+
+
+class Summary(Metric):
+    """Count and sum of observed values (e.g. seconds waited)."""
+    type = 'summary'
+
+    def __init__(self, name, documentation):
+        super().__init__(name, documentation)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        with _lock:
+            self.count += 1
+            self.sum += value
+
+    def samples(self):
+        yield f'{self.name}_count', self.count
+        yield f'{self.name}_sum', f'{self.sum:.6f}'
+
+
+def render_metrics():
+    return '\n'.join(metric.render() for metric in REGISTRY) + '\n'
+
+
+def metrics_view(request):
+    allowed_ips = getattr(settings, 'METRICS_ALLOWED_IPS', ('127.0.0.1', '::1'))
+    if request.META.get('REMOTE_ADDR') not in allowed_ips and not request.user.is_staff:
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
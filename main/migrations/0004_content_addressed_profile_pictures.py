@@ -0,0 +1,43 @@
+# Generated by Django 4.1.5 on 2026-10-18 10:38
+
+from django.db import migrations, models
+from django.db.models import Count
+import main.storage
+
+
+def count_existing_pictures(apps, schema_editor):
+    UserProfile = apps.get_model('main', 'UserProfile')
+    MediaBlob = apps.get_model('main', 'MediaBlob')
+    references = (
+        UserProfile.objects.exclude(profile_picture='').exclude(profile_picture__isnull=True)
+        .values('profile_picture').annotate(refs=Count('id')).order_by()
+    )
+    MediaBlob.objects.bulk_create(
+        (MediaBlob(name=row['profile_picture'], ref_count=row['refs']) for row in references.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_userprofile_profile_picture_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='userprofile',
+            name='profile_picture',
+            field=models.ImageField(blank=True, db_index=True, null=True, storage=main.storage.profile_picture_storage, upload_to='profile_pics/'),
+        ),
+        migrations.RunPython(count_existing_pictures, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.1.5 on 2026-10-18 10:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_contactmessage_submitted_at_default'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(fields=['-submitted_at', '-id'], name='contact_submitted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(fields=['email', '-submitted_at'], name='contact_email_idx'),
+        ),
+    ]
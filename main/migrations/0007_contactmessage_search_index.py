@@ -0,0 +1,24 @@
+from django.db import migrations
+
+from main.search import install_search_index, uninstall_search_index
+
+
+def install(apps, schema_editor):
+    install_search_index(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    uninstall_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    # On Postgres, adding the generated column rewrites the table; on a large
+    # table run this in a maintenance window.
+
+    dependencies = [
+        ('main', '0006_contactmessage_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
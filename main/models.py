@@ -1,18 +1,115 @@
-from django.db import models
+import copy
+
+from django.db import models, transaction
+from django.db.models import DEFERRED, F
+from django.utils import timezone
 from django.contrib.auth.models import User
+from .storage import profile_picture_storage
+
+
+class MediaBlobManager(models.Manager):
+    def retain(self, name):
+        """Record one more reference to the stored file ``name``"""
+        if not name:
+            return
+        blob, created = self.get_or_create(name=name, defaults={'ref_count': 1})
+        if not created:
+            self.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+
+    def release(self, name, storage):
+        """Drop one reference to ``name`` and delete the file once nothing uses it"""
+        if not name:
+            return
+        self.filter(name=name, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+        blob = self.filter(name=name).first()
+        if blob is not None and blob.ref_count > 0:
+            return
+        # The counter decides when to look; the table decides whether to delete.
+        if UserProfile.objects.filter(profile_picture=name).exists():
+            return
+        self.filter(name=name).delete()
+
+        def delete_file():
+            # Someone may have uploaded the same bytes in the meantime.
+            if not self.filter(name=name).exists():
+                storage.delete(name)
+
+        transaction.on_commit(delete_file)
+
+
+class MediaBlob(models.Model):
+    """A content-addressed file in media storage and how many profiles use it"""
+    name = models.CharField(max_length=255, unique=True)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = MediaBlobManager()
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
+
 
 class UserProfile(models.Model):
     """Extended user profile for login system"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     phone = models.CharField(max_length=20, blank=True, null=True)
     bio = models.TextField(blank=True, null=True)
-    profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
+    profile_picture = models.ImageField(
+        upload_to='profile_pics/', storage=profile_picture_storage, blank=True, null=True, db_index=True
+    )
+    # Filled in by main.renditions once the picture has been resized.
+    profile_picture_renditions = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Fields whose stored values are remembered, so we can tell what a save
+    # would actually change (see get_dirty_fields).
+    TRACKED_FIELDS = ('phone', 'bio', 'profile_picture', 'profile_picture_renditions')
+
     def __str__(self):
         return f"{self.user.username} - Profile"
-    
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_stored_values()
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._remember_stored_values(kwargs.get('update_fields'))
+
+    def _tracked_value(self, name):
+        value = self.__dict__.get(name, DEFERRED)
+        if name == 'profile_picture' and value is not DEFERRED:
+            # str from the database, FieldFile or File once assigned.
+            return getattr(value, 'name', value) or ''
+        return value
+
+    def _remember_stored_values(self, fields=None):
+        stored = getattr(self, '_stored_values', {})
+        for name in fields or self.TRACKED_FIELDS:
+            if name in self.TRACKED_FIELDS:
+                stored[name] = copy.deepcopy(self._tracked_value(name))
+        self._stored_values = stored
+
+    def stored_value(self, name, default=None):
+        """Value of a tracked field as last loaded from / saved to the database"""
+        value = getattr(self, '_stored_values', {}).get(name, DEFERRED)
+        return default if value is DEFERRED else value
+
+    def get_dirty_fields(self):
+        """Tracked fields changed since the profile was loaded or last saved"""
+        stored = getattr(self, '_stored_values', {})
+        dirty = []
+        for name in self.TRACKED_FIELDS:
+            current = self._tracked_value(name)
+            if current is DEFERRED:
+                continue
+            if self._state.adding or stored.get(name, DEFERRED) != current:
+                dirty.append(name)
+        return dirty
+
     class Meta:
         verbose_name_plural = "User Profiles"
 
@@ -22,7 +119,21 @@ class ContactMessage(models.Model):
     email = models.EmailField()
     phone = models.CharField(max_length=20)
     message = models.TextField()
-    submitted_at = models.DateTimeField(auto_now_add=True)
+    # Set when the submission is accepted, which may be before the row is
+    # written (see main/ingest.py), so not auto_now_add.
+    submitted_at = models.DateTimeField(default=timezone.now, editable=False)
+    # Hash of the normalised email + message, for dropping repeats (main/dedup.py).
+    fingerprint = models.CharField(max_length=64, blank=True, null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Admin listing (newest first, keyset-paged) and date filters.
+            models.Index(fields=['-submitted_at', '-id'], name='contact_submitted_idx'),
+            # All messages from one sender.
+            models.Index(fields=['email', '-submitted_at'], name='contact_email_idx'),
+            # "Was this exact message stored in the last hour?"
+            models.Index(fields=['fingerprint', '-submitted_at'], name='contact_fingerprint_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.email}"
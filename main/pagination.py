@@ -0,0 +1,155 @@
+"""
+Pagination for admin changelists over large tables.
+
+* ``estimated_count()`` avoids a full ``COUNT(*)`` for unfiltered tables:
+  Postgres' planner estimate (``pg_class.reltuples``) or, elsewhere, an exact
+  count cached for ``ESTIMATED_COUNT_CACHE_TIMEOUT`` seconds. Tables smaller
+  than ``ESTIMATED_COUNT_THRESHOLD`` rows are always counted exactly.
+* ``EstimatedCountPaginator`` uses it when the queryset has no filters, and
+  sets ``count_is_estimate`` when the count it got wasn't exact.
+* ``KeysetPaginator`` seeks from the last row shown (``WHERE (a, b) < (...)``)
+  instead of ``OFFSET``, so page 10,000 costs the same as page 1.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+
+def estimated_count(model, using='default'):
+    """
+    Approximate number of rows in ``model``'s table, as ``(count,
+    is_estimate)``; ``is_estimate`` is False when the rows were just counted.
+    """
+    threshold = getattr(settings, 'ESTIMATED_COUNT_THRESHOLD', 10000)
+    table = model._meta.db_table
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+            row = cursor.fetchone()
+        # reltuples is -1 (or 0) until the table is first vacuumed/analyzed.
+        estimate = row[0] if row else -1
+        if estimate >= threshold:
+            return estimate, True
+        return model._default_manager.using(using).count(), False
+
+    key = f'estimated_count:{using}:{table}'
+    count = cache.get(key)
+    if count is not None:
+        return count, True
+    count = model._default_manager.using(using).count()
+    if count >= threshold:
+        cache.set(key, count, getattr(settings, 'ESTIMATED_COUNT_CACHE_TIMEOUT', 60))
+    return count, False
+
+
+def is_unfiltered(queryset):
+    return not queryset.query.where
+
+
+class EstimatedCountPaginator(Paginator):
+    """``Paginator`` whose ``count`` is estimated when nothing is filtered."""
+
+    # Set once ``count`` has been computed.
+    count_is_estimate = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if is_unfiltered(queryset):
+            count, self.count_is_estimate = estimated_count(queryset.model, queryset.db)
+            return count
+        return super().count
+
+
+def _parse_value(field, raw):
+    if field.get_internal_type() == 'DateTimeField':
+        value = parse_datetime(raw)
+        if value is None:
+            raise ValueError(raw)
+        return value
+    return field.to_python(raw)
+
+
+class KeysetPaginator:
+    """
+    Seek pagination over ``queryset`` ordered by ``ordering``.
+
+    ``ordering`` must end in a unique field (usually ``'-id'``) and every
+    field must run the same direction. Positions are opaque cursors (the
+    ordering values of a row joined with ``|``) passed as ``after`` (older
+    rows) or ``before`` (newer rows).
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = list(ordering)
+        self.per_page = per_page
+        self.descending = self.ordering[0].startswith('-')
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        if any(name.startswith('-') != self.descending for name in self.ordering):
+            raise ValueError("Keyset ordering fields must all run the same direction")
+
+    def cursor(self, obj):
+        return '|'.join(
+            value.isoformat() if hasattr(value, 'isoformat') else str(value)
+            for value in (getattr(obj, name) for name in self.fields)
+        )
+
+    def parse_cursor(self, cursor):
+        """Split a cursor into field values; raises ``ValueError`` if it's malformed."""
+        raw_values = cursor.split('|')
+        if len(raw_values) != len(self.fields):
+            raise ValueError(cursor)
+        opts = self.queryset.model._meta
+        try:
+            return [_parse_value(opts.get_field(name), raw) for name, raw in zip(self.fields, raw_values)]
+        except Exception as exc:
+            raise ValueError(cursor) from exc
+
+    def _seek(self, values, forward):
+        # (a, b) < (x, y)  ==  a < x OR (a = x AND b < y), which the
+        # (a, b) index answers with a range scan.
+        lookup = 'lt' if forward == self.descending else 'gt'
+        condition = Q()
+        for i, name in enumerate(self.fields):
+            step = Q(**{f'{name}__{lookup}': values[i]})
+            for prior, value in zip(self.fields[:i], values[:i]):
+                step &= Q(**{prior: value})
+            condition |= step
+        return condition
+
+    def page(self, after=None, before=None):
+        """
+        Return ``(objects, newer_cursor, older_cursor)`` for the page after
+        ``after``, before ``before``, or the first page. Either cursor is None
+        at the corresponding end.
+        """
+        if before is not None:
+            reverse = [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+            rows = list(
+                self.queryset.filter(self._seek(self.parse_cursor(before), forward=False))
+                .order_by(*reverse)[:self.per_page + 1]
+            )
+            has_newer = len(rows) > self.per_page
+            objects = rows[:self.per_page][::-1]
+            has_older = True
+        else:
+            queryset = self.queryset.order_by(*self.ordering)
+            if after is not None:
+                queryset = queryset.filter(self._seek(self.parse_cursor(after), forward=True))
+            rows = list(queryset[:self.per_page + 1])
+            has_older = len(rows) > self.per_page
+            objects = rows[:self.per_page]
+            has_newer = after is not None
+
+        if not objects:
+            return objects, None, None
+        newer = self.cursor(objects[0]) if has_newer else None
+        older = self.cursor(objects[-1]) if has_older else None
+        return objects, newer, older
@@ -0,0 +1,251 @@
+"""
+Fixed-size renditions of profile pictures.
+
+Every time a profile picture changes we render it at a few fixed sizes in
+WebP with a JPEG fallback and record the resulting files on the profile in
+``UserProfile.profile_picture_renditions``:
+
+    {
+        "source": "profile_pics/3f/3f9a....jpg",
+        "sizes": {
+            "48": {"webp": "profile_renditions/3f/3f9a..._48_c2e1a0b4.webp",
+                   "jpeg": "profile_renditions/3f/3f9a..._48_c2e1a0b4.jpg"},
+            ...
+        }
+    }
+
+The work runs on a small background thread pool after the transaction that
+changed the picture commits, so uploads never wait on Pillow. Renditions
+live in ``default_storage`` under the source's shard and content-hash stem,
+plus the size and a hash of the encoder settings (``rendition_name``):
+profiles sharing a content-addressed picture share its renditions, a
+rendition that already exists is not rendered again, changing
+``RENDITION_FORMATS`` gives new names, and a rendition's source can be
+looked up from its name (``rendition_source_prefixes``).
+"""
+
+import hashlib
+import logging
+import posixpath
+import re
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from PIL import Image, ImageOps
+
+from .auth import forget_user
+
+logger = logging.getLogger(__name__)
+
+RENDITION_SIZES = tuple(getattr(settings, 'PROFILE_PICTURE_RENDITION_SIZES', (48, 96, 300)))
+PICTURE_DIR = 'profile_pics'
+RENDITION_DIR = 'profile_renditions'
+
+# (extension, Pillow format, save options) in order of preference.
+RENDITION_FORMATS = (
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpeg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+CONTENT_TYPES = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'PROFILE_PICTURE_RENDITION_WORKERS', 2),
+    thread_name_prefix='renditions',
+)
+
+
+# Changes whenever the encoder settings do, so re-rendering never overwrites.
+SETTINGS_KEY = hashlib.sha256(repr(RENDITION_FORMATS).encode()).hexdigest()[:8]
+RENDITION_RE = re.compile(r'(?P<stem>.+)_\d+_[0-9a-f]{8}\.\w+')
+# Before SETTINGS_KEY: flat, with storage's 7-character suffix on collisions.
+LEGACY_RENDITION_RE = re.compile(r'(?P<stem>.+)_\d+(?:_[A-Za-z0-9]{7})?\.\w+')
+CONTENT_HASH_RE = re.compile(r'[0-9a-f]{64}')
+
+
+def rendition_name(source_name, size, ext):
+    """
+    Storage name for one rendition of ``source_name``: the picture's shard
+    and stem (its content hash), the size and ``SETTINGS_KEY``.
+    """
+    directory, filename = posixpath.split(source_name)
+    shard = directory.partition('/')[2]
+    stem = posixpath.splitext(filename)[0]
+    suffix = 'jpg' if ext == 'jpeg' else ext
+    return posixpath.join(RENDITION_DIR, shard, f'{stem}_{size}_{SETTINGS_KEY}.{suffix}')
+
+
+def rendition_source_prefixes(name):
+    """
+    Prefixes of the picture names the rendition ``name`` can belong to, or
+    an empty list if it isn't named like a rendition.
+    """
+    shard, filename = posixpath.split(posixpath.relpath(name, RENDITION_DIR))
+    match = RENDITION_RE.fullmatch(filename)
+    if match:
+        return [posixpath.join(PICTURE_DIR, shard, match['stem']) + '.']
+    match = LEGACY_RENDITION_RE.fullmatch(filename)
+    if match and not shard:
+        stem = match['stem']
+        prefixes = [f'{PICTURE_DIR}/{stem}.']
+        if CONTENT_HASH_RE.fullmatch(stem):
+            prefixes.append(f'{PICTURE_DIR}/{stem[:2]}/{stem}.')
+        return prefixes
+    return []
+
+
+def rendition_files(renditions):
+    """All storage names recorded in a ``profile_picture_renditions`` value."""
+    for formats in (renditions or {}).get('sizes', {}).values():
+        yield from formats.values()
+
+
+def _open_source(field, size):
+    field.open('rb')
+    try:
+        img = Image.open(field)
+        # Let the JPEG decoder scale down while decoding; far cheaper than
+        # decoding a 12 MP phone photo at full size and resizing afterwards.
+        img.draft('RGB', (size * 2, size * 2))
+        img = ImageOps.exif_transpose(img)
+        img.load()
+    finally:
+        field.close()
+    return img
+
+
+def _flatten(img):
+    """Drop alpha onto white; JPEG has no transparency."""
+    if img.mode in ('RGBA', 'LA', 'P'):
+        img = img.convert('RGBA')
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel('A'))
+        return background
+    return img.convert('RGB')
+
+
+def render_renditions(field, storage):
+    """
+    Render every size/format of ``field`` into ``storage``.
+
+    Returns the ``sizes`` mapping for ``profile_picture_renditions``.
+    """
+    img = _open_source(field, max(RENDITION_SIZES))
+    shortest_edge = min(img.size)
+    sizes = {}
+    for size in sorted(RENDITION_SIZES, reverse=True):
+        # Never upscale: a 200px upload gets no 300px rendition.
+        if size > shortest_edge and sizes:
+            continue
+        edge = min(size, shortest_edge)
+        square = ImageOps.fit(img, (edge, edge), Image.Resampling.LANCZOS)
+        formats = {}
+        for ext, pil_format, options in RENDITION_FORMATS:
+            name = rendition_name(field.name, edge, ext)
+            if storage.exists(name):
+                # Rendered already, for this or another profile with the same picture.
+                formats[ext] = name
+                continue
+            frame = square if pil_format == 'WEBP' and square.mode in ('RGB', 'RGBA') else _flatten(square)
+            buffer = BytesIO()
+            frame.save(buffer, pil_format, **options)
+            formats[ext] = storage.save(name, ContentFile(buffer.getvalue()))
+        sizes[str(edge)] = formats
+    return sizes
+
+
+def delete_renditions(renditions, storage, profile_id=None, keep=()):
+    """
+    Delete the files of ``renditions`` (which belonged to profile
+    ``profile_id``) except those in ``keep``. Nothing is deleted while
+    another profile has the same picture: they share the files.
+    """
+    from .models import UserProfile
+
+    names = set(rendition_files(renditions)) - set(keep)
+    source = (renditions or {}).get('source')
+    if not names or (source and UserProfile.objects.filter(profile_picture=source).exclude(pk=profile_id).exists()):
+        return
+    for name in sorted(names):
+        try:
+            storage.delete(name)
+        except OSError:
+            logger.warning("Could not delete rendition %s", name, exc_info=True)
+
+
+def update_renditions(profile_id, force=False):
+    """
+    Bring the renditions of one profile in line with its current picture.
+
+    Safe to call repeatedly; does nothing when the renditions are already
+    current, unless ``force`` (then only missing files are rendered, and the
+    previous set is deleted once the new one is stored). If the picture
+    changes while we are rendering, the stale result is thrown away and the
+    newer task wins.
+    """
+    from .models import UserProfile
+
+    profile = UserProfile.objects.filter(pk=profile_id).first()
+    if profile is None:
+        return
+    current = profile.profile_picture_renditions or {}
+    source = profile.profile_picture.name or ''
+    if not force and current.get('source', '') == source and (current.get('sizes') or not source):
+        return
+
+    storage = default_storage
+    renditions = {}
+    if source:
+        try:
+            renditions = {'source': source, 'sizes': render_renditions(profile.profile_picture, storage)}
+        except (OSError, ValueError, Image.DecompressionBombError):
+            logger.warning("Could not render profile picture %s", source, exc_info=True)
+            renditions = {'source': source, 'sizes': {}}
+
+    if source:
+        still_current = Q(profile_picture=source)
+    else:
+        still_current = Q(profile_picture='') | Q(profile_picture__isnull=True)
+    updated = UserProfile.objects.filter(still_current, pk=profile_id).update(
+        profile_picture_renditions=renditions
+    )
+    if updated:
+        # update() sends no post_save.
+        forget_user(profile.user_id)
+        delete_renditions(current, storage, profile_id, keep=rendition_files(renditions))
+    else:
+        delete_renditions(renditions, storage, profile_id, keep=rendition_files(current))
+
+
+def _run(profile_id):
+    close_old_connections()
+    try:
+        update_renditions(profile_id)
+    except Exception:
+        logger.exception("Rendition task failed for profile %s", profile_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_renditions(profile_id):
+    """Queue ``update_renditions`` to run once the current transaction commits."""
+    if getattr(settings, 'PROFILE_PICTURE_RENDITIONS_ASYNC', True):
+        transaction.on_commit(lambda: _executor.submit(_run, profile_id))
+    else:
+        transaction.on_commit(lambda: update_renditions(profile_id))
+
+
+def current_renditions(profile):
+    """The ``sizes`` of the profile's current picture, or None while they are pending."""
+    field = profile.profile_picture
+    renditions = profile.profile_picture_renditions or {}
+    return renditions.get('sizes') if field and renditions.get('source') == field.name else None
+
+
+def needs_renditions(profile):
+    current = profile.profile_picture_renditions or {}
+    return current.get('source', '') != (profile.profile_picture.name or '')
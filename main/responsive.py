@@ -0,0 +1,202 @@
+"""
+Resized AVIF/WebP variants of the site's static images, built by
+``collectstatic``.
+
+``ResponsiveStaticFilesStorage`` is WhiteNoise's
+``CompressedManifestStaticFilesStorage`` plus one more step: after the usual
+hashing and compression, every PNG/JPEG under ``STATIC_ROOT`` is rendered at
+each of ``RESPONSIVE_IMAGE_WIDTHS`` narrower than itself, in AVIF, WebP and
+its own format (small images also get a full-size AVIF and WebP):
+
+    images/img2.png -> images/img2.w320.3fa4c1d2e5b6.webp, ...
+
+The hash in the name is that of the source image, so a variant that already
+exists is never rendered again: re-running ``collectstatic`` only processes
+images whose content changed. Variants are added to ``staticfiles.json`` and
+described in ``responsive-images.json`` (intrinsic size plus the variant
+names per format and width), which ``{% responsive_image %}`` reads.
+
+The per-page CSS/JS bundles of main/assets.py are written by the same
+storage, just before hashing.
+"""
+
+import functools
+import hashlib
+import json
+import logging
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.base import ContentFile
+from PIL import Image
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+from . import assets
+
+logger = logging.getLogger(__name__)
+
+RESPONSIVE_MANIFEST = 'responsive-images.json'
+SOURCE_FORMATS = {'.png': 'png', '.jpg': 'jpeg', '.jpeg': 'jpeg'}
+# (format, extension, Pillow format, save options); best first, as they
+# appear in <picture>.
+VARIANT_FORMATS = (
+    ('avif', 'avif', 'AVIF', {'quality': 55}),
+    ('webp', 'webp', 'WEBP', {'quality': 80, 'method': 6}),
+    ('png', 'png', 'PNG', {'optimize': True}),
+    ('jpeg', 'jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+CONTENT_TYPES = {'avif': 'image/avif', 'webp': 'image/webp'}
+
+
+def responsive_widths():
+    return tuple(getattr(settings, 'RESPONSIVE_IMAGE_WIDTHS', (160, 320, 640, 1024, 1600)))
+
+
+def variant_name(name, width, content_hash, ext):
+    base, _ = posixpath.splitext(name)
+    return f'{base}.w{width}.{content_hash}.{ext}'
+
+
+def render_variant(img, width, pil_format, options):
+    height = max(1, round(img.height * width / img.width))
+    # reducing_gap: box-reduce first, so a 9000px logo isn't Lanczos-filtered at full size.
+    frame = img.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+    if pil_format == 'JPEG' and frame.mode != 'RGB':
+        frame = frame.convert('RGB')
+    buffer = BytesIO()
+    frame.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+class ResponsiveStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            # Written first, so they are hashed and compressed with everything else.
+            paths = {**paths, **self.build_bundles()}
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+
+        previous = self.load_responsive_manifest()
+        images = {}
+        for name in sorted(paths):
+            source_format = SOURCE_FORMATS.get(posixpath.splitext(name)[1].lower())
+            if source_format is None:
+                continue
+            try:
+                images[name], rendered = self.build_variants(name, source_format, previous.get(name))
+            except (OSError, ValueError, Image.DecompressionBombError) as exc:
+                logger.warning("Could not build responsive variants of %s: %s", name, exc)
+                continue
+            for variant in rendered:
+                yield name, variant, True
+
+        for entry in images.values():
+            for variants in entry['variants'].values():
+                for variant in variants.values():
+                    self.hashed_files[variant] = variant
+        self.save_manifest()
+        self._save_json(RESPONSIVE_MANIFEST, {'images': images})
+
+    def build_variants(self, name, source_format, previous):
+        """Return ``(manifest entry, names rendered now)`` for one source image."""
+        with self.open(name) as f:
+            data = f.read()
+        content_hash = hashlib.sha256(data).hexdigest()[:12]
+        formats = [fmt for fmt in VARIANT_FORMATS if fmt[0] in ('avif', 'webp', source_format)]
+
+        if previous and previous.get('hash') == content_hash:
+            width, height = previous['width'], previous['height']
+            img = None
+        else:
+            img = Image.open(BytesIO(data))
+            width, height = img.size
+
+        widths = [w for w in responsive_widths() if w < width]
+        if width <= max(responsive_widths(), default=0):
+            # Small images: a full-size AVIF/WebP too (the original covers its own format).
+            modern_widths = widths + [width]
+        else:
+            modern_widths = widths
+        entry = {'hash': content_hash, 'width': width, 'height': height, 'variants': {}}
+        rendered = []
+        for format_name, ext, pil_format, save_options in formats:
+            entry['variants'][format_name] = {}
+            for target in (modern_widths if format_name in CONTENT_TYPES else widths):
+                variant = variant_name(name, target, content_hash, ext)
+                if not self.exists(variant):
+                    if img is None:
+                        img = Image.open(BytesIO(data))
+                    if img.mode not in ('RGB', 'RGBA'):
+                        img = img.convert('RGBA')
+                    self._save(variant, ContentFile(render_variant(img, target, pil_format, save_options)))
+                    rendered.append(variant)
+                entry['variants'][format_name][str(target)] = variant
+        return entry, rendered
+
+    def build_bundles(self):
+        """Write ``assets.ASSET_BUNDLES`` (and critical CSS); return them as post_process paths."""
+        def read(name):
+            if not self.exists(name):
+                return None
+            with self.open(name) as f:
+                return f.read().decode()
+
+        written, manifest = {}, {}
+        for name, sources in assets.ASSET_BUNDLES.items():
+            content, before, after = assets.build_bundle(name, sources, read)
+            path = assets.bundle_path(name)
+            self._save_text(path, content)
+            written[path] = (self, path)
+            entry = {
+                'before': before, 'after': after, 'bundled': len(sources) - len(before) - len(after), 'critical': None,
+            }
+            if name in assets.CRITICAL_CSS:
+                critical = assets.critical_path(name)
+                self._save_text(critical, assets.critical_css(content, assets.CRITICAL_CSS[name]))
+                written[critical] = (self, critical)
+                entry['critical'] = critical
+            manifest[name] = entry
+        self._save_json(assets.BUNDLE_MANIFEST, {'bundles': manifest})
+        return written
+
+    def load_responsive_manifest(self):
+        try:
+            with self.open(RESPONSIVE_MANIFEST) as f:
+                return json.loads(f.read().decode()).get('images', {})
+        except (OSError, ValueError):
+            return {}
+
+    def _save_json(self, name, data):
+        self._save_text(name, json.dumps(data))
+
+    def _save_text(self, name, text):
+        if self.exists(name):
+            self.delete(name)
+        self._save(name, ContentFile(text.encode()))
+
+
+@functools.lru_cache(maxsize=None)
+def responsive_manifest():
+    """The collected ``responsive-images.json`` (empty without collectstatic)."""
+    try:
+        with staticfiles_storage.open(RESPONSIVE_MANIFEST) as f:
+            return json.loads(f.read().decode()).get('images', {})
+    except (OSError, ValueError):
+        return {}
+
+
+@functools.lru_cache(maxsize=256)
+def intrinsic_size(name):
+    """Width and height of an uncollected static image (development), or None."""
+    path = finders.find(name)
+    if not path:
+        return None
+    try:
+        with Image.open(path) as img:
+            return img.size
+    except (OSError, ValueError):
+        return None
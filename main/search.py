@@ -0,0 +1,170 @@
+"""
+Full-text search over contact messages (name, email, phone and message body).
+
+* Postgres: a stored, generated ``search_vector`` tsvector column (name,
+  email and phone weighted above the body) with a GIN index, queried with
+  ``websearch_to_tsquery`` and ranked with ``ts_rank_cd``.
+* SQLite: an FTS5 external-content table, ``main_contactmessage_fts``, kept
+  in sync by triggers on ``main_contactmessage`` and ranked with ``bm25``.
+* Anything else falls back to ``icontains`` (a sequential scan).
+
+The index is created by migration 0007 (``SEARCH_MIGRATION``) and rebuilt
+with the phone column by 0009. Django
+rebuilds an SQLite table (dropping its triggers) for some schema changes, so
+``install_search_index`` also runs after every ``migrate`` and restores
+anything missing.
+"""
+
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+TABLE = 'main_contactmessage'
+FTS_TABLE = 'main_contactmessage_fts'
+SEARCH_CONFIG = 'english'
+SEARCH_MIGRATION = '0007_contactmessage_search_index'
+
+POSTGRES_INSTALL = [
+    f"""
+    ALTER TABLE {TABLE} ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(email, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(phone, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(message, '')), 'B')
+    ) STORED
+    """,
+    f"CREATE INDEX IF NOT EXISTS contact_search_idx ON {TABLE} USING GIN (search_vector)",
+]
+POSTGRES_UNINSTALL = [
+    "DROP INDEX IF EXISTS contact_search_idx",
+    f"ALTER TABLE {TABLE} DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_TRIGGERS = {
+    f'{FTS_TABLE}_ai': f"""
+        CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, name, email, phone, message)
+            VALUES (new.id, new.name, new.email, new.phone, new.message);
+        END
+    """,
+    f'{FTS_TABLE}_ad': f"""
+        CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, email, phone, message)
+            VALUES ('delete', old.id, old.name, old.email, old.phone, old.message);
+        END
+    """,
+    f'{FTS_TABLE}_au': f"""
+        CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF name, email, phone, message ON {TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, email, phone, message)
+            VALUES ('delete', old.id, old.name, old.email, old.phone, old.message);
+            INSERT INTO {FTS_TABLE}(rowid, name, email, phone, message)
+            VALUES (new.id, new.name, new.email, new.phone, new.message);
+        END
+    """,
+}
+
+# bm25() weights per column (name, email, phone, message); lower scores are better.
+SQLITE_WEIGHTS = '10.0, 10.0, 10.0, 1.0'
+FTS_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def install_search_index(connection):
+    """Create the index for ``connection``'s database if it's missing; idempotent."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for statement in POSTGRES_INSTALL:
+                cursor.execute(statement)
+        elif connection.vendor == 'sqlite':
+            tables = connection.introspection.table_names(cursor)
+            if TABLE not in tables:
+                return
+            created = FTS_TABLE not in tables
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                f"name, email, phone, message, content='{TABLE}', content_rowid='id', "
+                f"tokenize='unicode61 remove_diacritics 2')"
+            )
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s", [TABLE])
+            existing = {row[0] for row in cursor.fetchall()}
+            for name, statement in SQLITE_TRIGGERS.items():
+                if name not in existing:
+                    cursor.execute(statement)
+            if created or existing != set(SQLITE_TRIGGERS):
+                # Rows written while the triggers were missing aren't indexed.
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def uninstall_search_index(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for statement in POSTGRES_UNINSTALL:
+                cursor.execute(statement)
+        elif connection.vendor == 'sqlite':
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def fts5_query(text):
+    """
+    Turn free text into an FTS5 query: every word must match, the last one
+    as a prefix (so results appear while typing). Words are quoted, so FTS5
+    operators in user input are taken literally.
+    """
+    terms = FTS_TERM_RE.findall(text)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def search_contact_messages(text, queryset=None):
+    """
+    Filter ``queryset`` (default: all contact messages) to those matching
+    ``text`` and annotate each with ``rank`` (higher is better). The result
+    isn't ordered by rank; use ``ranked_search`` for that.
+    """
+    from .models import ContactMessage
+
+    if queryset is None:
+        queryset = ContactMessage.objects.all()
+    text = text.strip()
+    vendor = connections[queryset.db].vendor
+
+    if vendor == 'postgresql':
+        query = f"websearch_to_tsquery('{SEARCH_CONFIG}', %s)"
+        return queryset.filter(
+            RawSQL(f'{TABLE}.search_vector @@ {query}', (text,), output_field=BooleanField())
+        ).annotate(
+            rank=RawSQL(f'ts_rank_cd({TABLE}.search_vector, {query})', (text,), output_field=FloatField())
+        )
+
+    if vendor == 'sqlite':
+        match = fts5_query(text)
+        if match is None:
+            return queryset.none().annotate(rank=Value(0.0, output_field=FloatField()))
+        return queryset.filter(
+            RawSQL(f'{TABLE}.id IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)',
+                   (match,), output_field=BooleanField())
+        ).annotate(
+            rank=RawSQL(
+                f'(SELECT -bm25({FTS_TABLE}, {SQLITE_WEIGHTS}) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s AND rowid = {TABLE}.id)',
+                (match,), output_field=FloatField(),
+            )
+        )
+
+    condition = Q()
+    for term in text.split():
+        condition &= (
+            Q(name__icontains=term) | Q(email__icontains=term) | Q(phone__icontains=term) | Q(message__icontains=term)
+        )
+    return queryset.filter(condition).annotate(rank=Value(1.0, output_field=FloatField()))
+
+
+def ranked_search(text, queryset=None, limit=20):
+    """The ``limit`` best matches for ``text``, best first."""
+    return search_contact_messages(text, queryset).order_by('-rank', '-submitted_at', '-id')[:limit]
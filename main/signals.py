@@ -1,7 +1,13 @@
-from django.db.models.signals import post_save
+from django.db import connections, transaction
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models.signals import post_delete, post_migrate, post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import UserProfile
+from django.core.files.storage import default_storage
+from .auth import forget_user
+from .models import MediaBlob, UserProfile
+from .renditions import delete_renditions, needs_renditions, schedule_renditions
+from .search import SEARCH_MIGRATION, install_search_index
 
 
 @receiver(post_save, sender=User)
@@ -13,6 +19,72 @@ def create_user_profile(sender, instance, created, **kwargs):
 
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
-    """Save the UserProfile when a User is saved"""
-    if hasattr(instance, 'profile'):
-        instance.profile.save()
+    """Save the UserProfile along with its User, but only if it has unsaved changes"""
+    # Only a profile that is already loaded can carry changes; fetching it
+    # here (e.g. for the last_login update on every login) would just cost
+    # a query and an UPDATE that bumps updated_at for nothing.
+    profile = instance._state.fields_cache.get('profile')
+    if profile is None:
+        return
+    if profile._state.adding:
+        profile.save()
+        return
+    dirty_fields = profile.get_dirty_fields()
+    if dirty_fields:
+        profile.save(update_fields=dirty_fields + ['updated_at'])
+
+
+@receiver(post_save, sender=UserProfile)
+def refresh_profile_picture_renditions(sender, instance, **kwargs):
+    """Re-render the picture sizes whenever the profile picture changes"""
+    if needs_renditions(instance):
+        schedule_renditions(instance.pk)
+
+
+@receiver(post_delete, sender=UserProfile)
+def delete_profile_picture_renditions(sender, instance, using, **kwargs):
+    """Remove rendered sizes together with the profile, once the delete commits"""
+    renditions, pk = instance.profile_picture_renditions, instance.pk
+    transaction.on_commit(lambda: delete_renditions(renditions, default_storage, pk), using=using)
+
+
+@receiver(post_save, sender=UserProfile)
+def track_profile_picture_references(sender, instance, update_fields=None, **kwargs):
+    """Keep MediaBlob reference counts in step with the stored picture"""
+    if update_fields is not None and 'profile_picture' not in update_fields:
+        return
+    current = instance.profile_picture.name or ''
+    stored = instance.stored_value('profile_picture', '')
+    if current != stored:
+        MediaBlob.objects.retain(current)
+        MediaBlob.objects.release(stored, instance.profile_picture.storage)
+
+
+@receiver(post_delete, sender=UserProfile)
+def release_profile_picture(sender, instance, **kwargs):
+    """Release the picture of a deleted profile (e.g. when its User is deleted)"""
+    MediaBlob.objects.release(instance.stored_value('profile_picture', ''), instance.profile_picture.storage)
+
+
+@receiver(post_migrate)
+def restore_search_index(sender, using, plan=None, **kwargs):
+    """Recreate contact search triggers dropped by SQLite table rebuilds"""
+    if sender.name != 'main':
+        return
+    connection = connections[using]
+    if (sender.label, SEARCH_MIGRATION) in MigrationRecorder(connection).applied_migrations():
+        install_search_index(connection)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    """Drop the cached user + profile pair when the user changes"""
+    forget_user(instance.pk)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def forget_cached_profile_user(sender, instance, **kwargs):
+    """Drop the cached user + profile pair when the profile changes"""
+    forget_user(instance.user_id)
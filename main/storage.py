@@ -0,0 +1,96 @@
+"""
+Content-addressed media storage for profile pictures.
+
+Files are named after the SHA-256 of their bytes, sharded by the first two
+hex digits::
+
+    profile_pics/3f/3fa4...e1.jpg
+
+Saving bytes that are already stored is a no-op that returns the existing
+name, so re-uploads and shared avatars are kept once on disk. How many
+profiles point at each file is tracked by ``main.models.MediaBlob``; the file
+is removed when the last reference goes away.
+"""
+
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# Normalise equivalent extensions so identical bytes always map to one name.
+EXTENSION_ALIASES = {'.jpeg': '.jpg', '.jpe': '.jpg'}
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that names files by content hash and never writes a blob twice."""
+
+    hash_algorithm = 'sha256'
+
+    def hashed_name(self, name, digest):
+        dirname = posixpath.dirname(name)
+        ext = os.path.splitext(name)[1].lower()
+        ext = EXTENSION_ALIASES.get(ext, ext)
+        return posixpath.join(dirname, digest[:2], digest + ext)
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is only known once the content is hashed in _save();
+        # a name collision there means identical content, not a conflict.
+        return name
+
+    def _is_seekable(self, content):
+        try:
+            return content.seekable()
+        except (AttributeError, ValueError):
+            return hasattr(content, 'seek')
+
+    def _save(self, name, content):
+        # Seekable content (every UploadedFile) is hashed first so a blob we
+        # already have costs one read and no write at all.
+        if self._is_seekable(content):
+            digest = hashlib.new(self.hash_algorithm)
+            for chunk in content.chunks():
+                digest.update(chunk)
+            final_name = self.hashed_name(name, digest.hexdigest())
+            if self.exists(final_name):
+                return final_name
+            content.seek(0)
+
+        directory = os.path.dirname(self.path(name))
+        os.makedirs(directory, exist_ok=True)
+        digest = hashlib.new(self.hash_algorithm)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    tmp.write(chunk)
+
+            final_name = self.hashed_name(name, digest.hexdigest())
+            final_path = self.path(final_name)
+            if os.path.exists(final_path):
+                os.remove(tmp_path)
+            else:
+                # Written under a temporary name and renamed into place, so
+                # readers never see a partial blob and concurrent uploads of
+                # the same bytes simply race to an identical file.
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(tmp_path, final_path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(final_path, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return final_name
+
+
+profile_picture_storage_instance = ContentAddressedStorage()
+
+
+def profile_picture_storage():
+    """Storage callable for ``UserProfile.profile_picture``."""
+    return profile_picture_storage_instance
@@ -0,0 +1,85 @@
+import functools
+
+from django import template
+from django.contrib.staticfiles import finders
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+
+from ..assets import ASSET_BUNDLES, VENDOR_ASSETS, bundle_manifest, bundle_path, critical_text
+
+register = template.Library()
+
+
+@functools.lru_cache(maxsize=None)
+def _source_url(source):
+    """A bundle source's URL when serving sources one by one: its CDN until it is vendored."""
+    if source in VENDOR_ASSETS and not finders.find(source):
+        return VENDOR_ASSETS[source]['url']
+    return static(source)
+
+
+INTEGRITY = {asset['url']: asset['integrity'] for asset in VENDOR_ASSETS.values() if 'integrity' in asset}
+
+
+def _external(urls, html):
+    """``html`` (with ``{}`` for the URL and its attributes) for each of ``urls``."""
+    return format_html_join('', html, (
+        (url, format_html(' integrity="{}" crossorigin="anonymous"', INTEGRITY[url]) if url in INTEGRITY else '')
+        for url in urls
+    ))
+
+
+STYLESHEET = '<link rel="stylesheet" href="{}"{}>'
+# Loaded without blocking render, for pages with critical CSS inlined.
+DEFERRED_STYLESHEET = (
+    '<link rel="preload" href="{0}" as="style"{1} onload="this.onload=null;this.rel=\'stylesheet\'">'
+    '<noscript><link rel="stylesheet" href="{0}"{1}></noscript>'
+)
+
+
+@register.simple_tag
+def css_bundle(name):
+    """
+    The stylesheet(s) of bundle ``name`` (see main/assets.py)::
+
+        {% load asset_bundles %}
+        {% css_bundle 'home.css' %}
+
+    With critical CSS, that is inlined and the rest loaded without blocking
+    render. Before ``collectstatic`` this links each source. CDN files not
+    vendored yet keep their place in the cascade around the bundle.
+    """
+    entry = bundle_manifest().get(name)
+    if entry is None:
+        return _external(map(_source_url, ASSET_BUNDLES[name]), STYLESHEET)
+
+    if not entry['bundled']:
+        return _external(entry['before'] + entry['after'], STYLESHEET)
+    url = static(bundle_path(name))
+    if entry['critical']:
+        return format_html(
+            '<style>{}</style>{}{}{}',
+            mark_safe(critical_text(entry['critical'])),
+            _external(entry['before'], DEFERRED_STYLESHEET),
+            _external([url], DEFERRED_STYLESHEET),
+            _external(entry['after'], DEFERRED_STYLESHEET),
+        )
+    return format_html(
+        '{}{}{}',
+        _external(entry['before'], STYLESHEET), _external([url], STYLESHEET), _external(entry['after'], STYLESHEET),
+    )
+
+
+@register.simple_tag
+def js_bundle(name):
+    """The deferred script(s) of bundle ``name``, in source order."""
+    html = '<script src="{}"{} defer></script>'
+    entry = bundle_manifest().get(name)
+    if entry is None:
+        return _external(map(_source_url, ASSET_BUNDLES[name]), html)
+    urls = list(entry['before'])
+    if entry['bundled']:
+        urls.append(static(bundle_path(name)))
+    urls.extend(entry['after'])
+    return _external(urls, html)
@@ -0,0 +1,66 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+
+from ..renditions import CONTENT_TYPES, current_renditions
+
+register = template.Library()
+
+
+def _srcset(storage, sizes, ext):
+    return ', '.join(
+        f'{storage.url(formats[ext])} {size}w'
+        for size, formats in sorted(sizes.items(), key=lambda item: int(item[0]))
+        if ext in formats
+    )
+
+
+def _closest(sizes, display_size):
+    """Smallest rendition at least as large as the display size."""
+    ordered = sorted(sizes, key=int)
+    for size in ordered:
+        if int(size) >= display_size:
+            return size
+    return ordered[-1]
+
+
+@register.simple_tag
+def profile_picture(profile, display_size=96, alt='Profile Picture', css_class=''):
+    """
+    Render a profile picture as ``<picture>`` with WebP and JPEG ``srcset``s.
+
+    Usage::
+
+        {% load profile_pictures %}
+        {% profile_picture profile 150 alt="Avatar" %}
+
+    Falls back to the original upload while renditions are still being
+    generated, and to nothing when the profile has no picture.
+    """
+    if not profile or not profile.profile_picture:
+        return ''
+
+    field = profile.profile_picture
+    sizes = current_renditions(profile)
+    if not sizes:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" width="{}" height="{}" decoding="async">',
+            field.url, alt, css_class, display_size, display_size,
+        )
+
+    storage = default_storage
+    sizes_attr = f'{display_size}px'
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (CONTENT_TYPES[ext], _srcset(storage, sizes, ext), sizes_attr)
+            for ext in CONTENT_TYPES if ext != 'jpeg'
+        ),
+    )
+    fallback = sizes[_closest(sizes, display_size)]['jpeg']
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" '
+        'width="{}" height="{}" decoding="async"></picture>',
+        sources, storage.url(fallback), _srcset(storage, sizes, 'jpeg'), sizes_attr,
+        alt, css_class, display_size, display_size,
+    )
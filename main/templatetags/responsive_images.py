@@ -0,0 +1,60 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from ..responsive import CONTENT_TYPES, intrinsic_size, responsive_manifest
+
+register = template.Library()
+
+
+def _srcset(variants, width, original_url=None):
+    candidates = [(static(name), int(size)) for size, name in variants.items()]
+    if original_url:
+        candidates.append((original_url, width))
+    return ', '.join(f'{url} {size}w' for url, size in sorted(candidates, key=lambda item: item[1]))
+
+
+@register.simple_tag
+def responsive_image(path, alt='', sizes='100vw', css_class='', loading='lazy'):
+    """
+    Render a static image as ``<picture>`` with AVIF and WebP ``srcset``s.
+
+    Usage::
+
+        {% load responsive_images %}
+        {% responsive_image 'images/img2.png' alt="Creative Work" sizes="(max-width: 768px) 90vw, 413px" %}
+
+    ``width``/``height`` are the image's intrinsic size, so the browser
+    reserves the space before it loads. Before ``collectstatic`` has built
+    the variants (e.g. under ``runserver``) this is a plain ``<img>``.
+    """
+    original_url = static(path)
+    class_attr = format_html(' class="{}"', css_class) if css_class else ''
+    entry = responsive_manifest().get(path)
+    if not entry:
+        size = intrinsic_size(path)
+        if size is None:
+            return format_html('<img src="{}" alt="{}"{} loading="{}" decoding="async">',
+                               original_url, alt, class_attr, loading)
+        return format_html(
+            '<img src="{}" alt="{}"{} width="{}" height="{}" loading="{}" decoding="async">',
+            original_url, alt, class_attr, size[0], size[1], loading,
+        )
+
+    width, height = entry['width'], entry['height']
+    variants = entry['variants']
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (content_type, _srcset(variants[fmt], width), sizes)
+            for fmt, content_type in CONTENT_TYPES.items() if variants.get(fmt)
+        ),
+    )
+    # The <img> itself: resized copies in the original format, then the original.
+    fallback = next((variants[fmt] for fmt in variants if fmt not in CONTENT_TYPES), {})
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" alt="{}"{} width="{}" height="{}" '
+        'loading="{}" decoding="async"></picture>',
+        sources, original_url, _srcset(fallback, width, original_url), sizes,
+        alt, class_attr, width, height, loading,
+    )
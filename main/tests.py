@@ -0,0 +1,76 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from .models import ContactMessage
+from .pagination import EstimatedCountPaginator
+from .search import search_contact_messages
+
+
+class ContactSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.message = ContactMessage.objects.create(
+            name='Ada Lovelace', email='ada@example.com', phone='5551234567', message='About the engine',
+        )
+        ContactMessage.objects.create(
+            name='Charles Babbage', email='charles@example.com', phone='5559876543', message='Difference engine',
+        )
+
+    def test_phone_number(self):
+        self.assertQuerysetEqual(search_contact_messages('5551234567'), [self.message])
+
+    def test_phone_prefix(self):
+        self.assertQuerysetEqual(search_contact_messages('555123'), [self.message])
+
+    def test_phone_updated(self):
+        ContactMessage.objects.filter(pk=self.message.pk).update(phone='5550000000')
+        self.assertQuerysetEqual(search_contact_messages('5551234567'), [])
+        self.assertQuerysetEqual(search_contact_messages('5550000000'), [self.message])
+
+    # The manifest storage needs collectstatic.
+    @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+    def test_admin_search_by_phone(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        response = self.client.get('/admin/main/contactmessage/', {'q': '5551234567'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.message])
+
+
+@override_settings(ESTIMATED_COUNT_THRESHOLD=2)
+class EstimatedCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(3):
+            ContactMessage.objects.create(name=f'Sender {i}', email=f'sender{i}@example.com', message='Hello')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_counted(self):
+        paginator = EstimatedCountPaginator(ContactMessage.objects.order_by('-id'), 10)
+        self.assertEqual(paginator.count, 3)
+        self.assertFalse(paginator.count_is_estimate)
+
+    def test_cached_count_is_an_estimate(self):
+        EstimatedCountPaginator(ContactMessage.objects.order_by('-id'), 10).count
+        paginator = EstimatedCountPaginator(ContactMessage.objects.order_by('-id'), 10)
+        self.assertEqual(paginator.count, 3)
+        self.assertTrue(paginator.count_is_estimate)
+
+    def test_filtered_count_is_exact(self):
+        EstimatedCountPaginator(ContactMessage.objects.order_by('-id'), 10).count
+        paginator = EstimatedCountPaginator(ContactMessage.objects.filter(name='Sender 0').order_by('-id'), 10)
+        self.assertEqual(paginator.count, 1)
+        self.assertFalse(paginator.count_is_estimate)
+
+    @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+    def test_admin_marks_only_estimates(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        response = self.client.get('/admin/main/contactmessage/')
+        self.assertFalse(response.context['cl'].count_is_estimate)
+        self.assertNotContains(response, '~3 contact')
+        response = self.client.get('/admin/main/contactmessage/')
+        self.assertTrue(response.context['cl'].count_is_estimate)
+        self.assertContains(response, '~3 contact')
@@ -0,0 +1,292 @@
+"""
+Validation for profile picture uploads.
+
+``ProfilePictureUploadHandler`` sits in front of Django's default upload
+handlers and checks the picture while the request body is still streaming in:
+the magic bytes of the first chunk must belong to a supported image format and
+the running byte count must stay under ``PROFILE_PICTURE_MAX_SIZE``. As soon
+as either check fails the upload is stopped without reading the rest of the
+body, so junk uploads never reach a temp file.
+
+Pictures that don't arrive as multipart files (the base64 ``cropped_image``
+field and raw ``application/octet-stream`` bodies) go through
+``spool_image``, which decodes/copies them chunk by chunk into a spooled
+temporary file with the same checks applied along the way.
+
+That early stop only saves anything under WSGI. Django's ASGI handler reads
+the whole body before the view runs, so under ASGI the size limit is enforced
+in front of Django by ``RequestBodyLimit`` (payantech/asgi.py), which refuses
+oversized bodies from their Content-Length or as they stream in: over
+``PROFILE_PICTURE_MAX_SIZE`` (plus multipart overhead) on the picture upload
+URLs, over ``REQUEST_BODY_MAX_SIZE`` anywhere else. A proxy's ``client_max_body_size`` (nginx) does the same before
+the bytes reach a worker at all.
+"""
+
+import base64
+import binascii
+import uuid
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.urls import reverse
+from PIL import Image
+
+PROFILE_PICTURE_FIELD = 'profile_picture'
+PROFILE_PICTURE_MAX_SIZE = getattr(settings, 'PROFILE_PICTURE_MAX_SIZE', 5 * 1024 * 1024)
+PROFILE_PICTURE_MIN_DIMENSIONS = getattr(settings, 'PROFILE_PICTURE_MIN_DIMENSIONS', (100, 100))
+
+# Multipart framing, the CSRF token and any other form fields sent next to
+# the picture. Anything above this in Content-Length is rejected unread.
+MULTIPART_OVERHEAD = 64 * 1024
+# The largest body accepted outside the picture upload URLs; the admin's own
+# picture field has to fit.
+REQUEST_BODY_MAX_SIZE = getattr(settings, 'REQUEST_BODY_MAX_SIZE', 10 * 1024 * 1024)
+
+STREAM_CHUNK_SIZE = 64 * 1024
+# Base64 turns every 3 bytes into 4 characters; decode whole 4-character groups.
+BASE64_CHUNK_CHARS = STREAM_CHUNK_SIZE // 3 * 4
+
+# Leading bytes of the formats we accept, with their content type and extension.
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png', 'png'),
+    (b'GIF87a', 'image/gif', 'gif'),
+    (b'GIF89a', 'image/gif', 'gif'),
+)
+VALID_CONTENT_TYPES = ('image/jpeg', 'image/png', 'image/gif', 'image/webp')
+
+SIZE_ERROR = 'File size must be less than 5MB'
+BODY_SIZE_ERROR = 'Request body too large'
+TYPE_ERROR = 'Please upload a valid image file (JPEG, PNG, GIF, or WebP)'
+INVALID_ERROR = 'Invalid image file'
+
+
+class ProfilePictureRejected(Exception):
+    """Raised when an uploaded profile picture fails validation."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def sniff_image_type(head):
+    """
+    Return ``(content_type, extension)`` for the image whose first bytes are
+    ``head``, or ``None`` when they don't match a supported format.
+    """
+    for signature, content_type, extension in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return content_type, extension
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp', 'webp'
+    return None
+
+
+def content_length_exceeded(request, limit=PROFILE_PICTURE_MAX_SIZE, overhead=MULTIPART_OVERHEAD):
+    """True when the declared request body is too large to hold a valid picture."""
+    try:
+        content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return False
+    return content_length > limit + overhead
+
+
+def validate_image_dimensions(image_file):
+    """Check the picture decodes and meets the minimum size; reads the header only."""
+    min_width, min_height = PROFILE_PICTURE_MIN_DIMENSIONS
+    try:
+        with Image.open(image_file) as img:
+            width, height = img.size
+    except (OSError, ValueError, Image.DecompressionBombError):
+        raise ProfilePictureRejected(INVALID_ERROR)
+    finally:
+        image_file.seek(0)
+    if width < min_width or height < min_height:
+        raise ProfilePictureRejected(f'Image must be at least {min_width}x{min_height} pixels')
+
+
+def spool_image(chunks, max_size=PROFILE_PICTURE_MAX_SIZE):
+    """
+    Copy an image arriving as an iterable of byte chunks into a temporary file.
+
+    The magic bytes are checked on the first chunk and the size on every
+    chunk, so an invalid picture is rejected without consuming the rest of
+    ``chunks``. Small pictures stay in memory; anything over
+    ``FILE_UPLOAD_MAX_MEMORY_SIZE`` rolls over to disk. Returns a ``File``
+    named ``profile_<uuid>.<ext>`` positioned at the start.
+    """
+    spool = SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+    sniffed = None
+    size = 0
+    try:
+        for chunk in chunks:
+            if not chunk:
+                continue
+            if sniffed is None:
+                sniffed = sniff_image_type(chunk[:16])
+                if sniffed is None:
+                    raise ProfilePictureRejected(TYPE_ERROR)
+            size += len(chunk)
+            if size > max_size:
+                raise ProfilePictureRejected(SIZE_ERROR, status=413)
+            spool.write(chunk)
+        if sniffed is None:
+            raise ProfilePictureRejected(INVALID_ERROR)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return File(spool, name=f'profile_{uuid.uuid4()}.{sniffed[1]}')
+
+
+def iter_base64_chunks(payload, start=0):
+    """Decode ``payload[start:]`` a slice at a time instead of all at once."""
+    for offset in range(start, len(payload), BASE64_CHUNK_CHARS):
+        try:
+            yield base64.b64decode(payload[offset:offset + BASE64_CHUNK_CHARS], validate=True)
+        except binascii.Error:
+            raise ProfilePictureRejected(INVALID_ERROR)
+
+
+def iter_request_chunks(request):
+    """Read the raw request body in ``STREAM_CHUNK_SIZE`` pieces."""
+    while True:
+        chunk = request.read(STREAM_CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+def decode_data_url(data_url, max_size=PROFILE_PICTURE_MAX_SIZE):
+    """
+    Turn a ``data:image/...;base64,`` URL into a spooled ``File``.
+
+    The encoded length tells us the decoded size up front, so oversized
+    payloads are refused before any decoding happens.
+    """
+    header_end = data_url.find(';base64,', 0, 64)
+    if not data_url.startswith('data:') or header_end == -1:
+        raise ProfilePictureRejected(INVALID_ERROR)
+    start = header_end + len(';base64,')
+    if (len(data_url) - start) // 4 * 3 > max_size + 2:
+        raise ProfilePictureRejected(SIZE_ERROR, status=413)
+    return spool_image(iter_base64_chunks(data_url, start), max_size)
+
+
+class ProfilePictureUploadHandler(FileUploadHandler):
+    """
+    Reject a profile picture upload as soon as it is known to be invalid.
+
+    The handler stores nothing itself: chunks are passed on unchanged to the
+    next handler in ``request.upload_handlers``. When a check fails,
+    ``self.error`` is set and the upload is stopped with
+    ``StopUpload(connection_reset=True)`` so the remaining body is never read
+    (under WSGI; see the module docstring for ASGI).
+    Views must insert it before ``request.POST``/``request.FILES`` are first
+    touched, which means the view has to handle CSRF itself.
+    """
+
+    def __init__(self, request=None, field_name=PROFILE_PICTURE_FIELD, max_size=PROFILE_PICTURE_MAX_SIZE):
+        super().__init__(request)
+        self.watched_field = field_name
+        self.max_size = max_size
+        self.error = None
+        self.detected_type = None
+        self._checking = False
+
+    def reject(self, error):
+        self.error = error
+        raise StopUpload(connection_reset=True)
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self._checking = field_name == self.watched_field
+        if not self._checking:
+            return
+        if self.content_type not in VALID_CONTENT_TYPES:
+            self.reject(ProfilePictureRejected(TYPE_ERROR))
+        if self.content_length and self.content_length > self.max_size:
+            self.reject(ProfilePictureRejected(SIZE_ERROR, status=413))
+
+    def receive_data_chunk(self, raw_data, start):
+        if self._checking:
+            if start == 0:
+                sniffed = sniff_image_type(raw_data[:16])
+                if sniffed is None:
+                    self.reject(ProfilePictureRejected(TYPE_ERROR))
+                self.detected_type = sniffed[0]
+            if start + len(raw_data) > self.max_size:
+                self.reject(ProfilePictureRejected(SIZE_ERROR, status=413))
+        return raw_data
+
+    def file_complete(self, file_size):
+        # Let the next handler build the UploadedFile.
+        return None
+
+
+class RequestBodyLimit:
+    """
+    ASGI middleware answering 413 to oversized request bodies before Django
+    buffers them: at once when Content-Length says so, otherwise as soon as
+    the streamed body passes the limit.
+
+    ``upload_paths`` (by default the profile picture upload URLs) are capped
+    at ``upload_max_size`` with the picture's ``SIZE_ERROR``; every other
+    path at ``max_size`` with a generic message.
+    """
+
+    def __init__(self, app, max_size=REQUEST_BODY_MAX_SIZE,
+                 upload_max_size=PROFILE_PICTURE_MAX_SIZE + MULTIPART_OVERHEAD, upload_paths=None):
+        self.app = app
+        self.max_size = max_size
+        self.upload_max_size = upload_max_size
+        if upload_paths is None:
+            upload_paths = (reverse('profile'), reverse('profile_picture_upload'))
+        self.upload_paths = frozenset(upload_paths)
+
+    def limit(self, scope):
+        """``(max_size, error)`` for the request in ``scope``."""
+        path = scope['path']
+        root_path = scope.get('root_path', '')
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        if path in self.upload_paths:
+            return self.upload_max_size, SIZE_ERROR
+        return self.max_size, BODY_SIZE_ERROR
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        max_size, error = self.limit(scope)
+        try:
+            declared = int(dict(scope['headers']).get(b'content-length') or 0)
+        except ValueError:
+            declared = 0
+        if declared > max_size:
+            return await self.reject(send, error)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > max_size:
+                    await self.reject(send, error)
+                    # Django gives up on the request without answering.
+                    return {'type': 'http.disconnect'}
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    async def reject(self, send, error):
+        await send({
+            'type': 'http.response.start',
+            'status': 413,
+            'headers': [(b'content-type', b'text/plain; charset=utf-8'), (b'connection', b'close')],
+        })
+        await send({'type': 'http.response.body', 'body': error.encode()})
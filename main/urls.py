@@ -1,12 +1,16 @@
 from django.urls import path
 from . import views
+from .metrics import metrics_view
 
 urlpatterns = [
     path('', views.login_view, name='login'),
     path('services/', views.services, name='services'),
     path('contact/', views.contact, name='contact'),
+    path('contact/search/', views.contact_search, name='contact_search'),
     path('home/', views.home, name='home'),
     path('register/', views.register_view, name='register'),
     path('logout/', views.logout_view, name='logout'),
     path('profile/', views.profile_view, name='profile'),
+    path('profile/picture/', views.profile_picture_upload, name='profile_picture_upload'),
+    path('metrics/', metrics_view, name='metrics'),
 ]
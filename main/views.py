@@ -1,59 +1,103 @@
 from django.shortcuts import render, redirect
 from .models import ContactMessage, UserProfile
-from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth import logout
 from django.contrib.auth.models import User
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
-from PIL import Image
-import os
-import base64
-import uuid
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import patch_vary_headers
+from django.contrib.auth.hashers import make_password
+from django.views.decorators.csrf import csrf_exempt
+from asgiref.sync import sync_to_async
+from .caching import cache_anonymous_page
+from .asyncutils import (
+    IMAGE_EXECUTOR,
+    aauthenticate,
+    acsrf_check,
+    alogin,
+    arender,
+    async_login_required,
+    run_in_executor,
+)
+from django.views.decorators.http import require_GET, require_POST
+from django.contrib.admin.views.decorators import staff_member_required
+from .hashing import HASHING_POOL, PoolSaturated
+from .dedup import CONTACT_DEDUP, contact_fingerprint
+from .forms import ContactMessageForm
+from .ingest import CONTACT_BUFFER
+from .renditions import current_renditions
+from .search import ranked_search
+from .templatetags.profile_pictures import profile_picture
+from .uploads import (
+    SIZE_ERROR,
+    TYPE_ERROR,
+    VALID_CONTENT_TYPES,
+    ProfilePictureRejected,
+    ProfilePictureUploadHandler,
+    content_length_exceeded,
+    decode_data_url,
+    iter_request_chunks,
+    spool_image,
+    validate_image_dimensions,
+)
 
-def home(request):
-    return render(request, "index.html")
+def _hashing_busy_response():
+    """Cheap 503 for when every password hashing slot and queue place is taken"""
+    response = HttpResponse("Too many sign-in requests right now. Please try again shortly.", status=503)
+    response['Retry-After'] = str(settings.PASSWORD_HASHING_RETRY_AFTER)
+    return response
 
-def login_view(request):
+async def login_view(request):
     if request.method == "POST":
         username = request.POST.get('username')
         password = request.POST.get('password')
 
-        user = authenticate(request, username=username, password=password)
+        try:
+            user = await aauthenticate(request, username=username, password=password)
+        except PoolSaturated:
+            return _hashing_busy_response()
 
         if user is not None:
-            login(request, user)
+            await alogin(request, user)
             messages.success(request, "Login successful!")
             return redirect('home')
         else:
             messages.error(request, "Invalid username or password")
 
-    return render(request, 'loginpage.html')
+    return await arender(request, 'loginpage.html')
 
-def register_view(request):
+async def register_view(request):
     if request.method == "POST":
         username = request.POST.get('username')
         email = request.POST.get('email')
         password = request.POST.get('password')
 
-        if User.objects.filter(username=username).exists():
+        if await User.objects.filter(username=username).aexists():
             messages.error(request, "Username already exists")
         else:
-            User.objects.create_user(
-                username=username,
-                email=email,
-                password=password
+            # Hash on the hashing pool, then insert; same result as create_user().
+            try:
+                hashed_password = await HASHING_POOL.arun(make_password, password)
+            except PoolSaturated:
+                return _hashing_busy_response()
+            await User.objects.acreate(
+                username=User.normalize_username(username),
+                email=User.objects.normalize_email(email),
+                password=hashed_password,
             )
             messages.success(request, "Account created successfully")
             return redirect('login')
 
-    return render(request, 'loginpage.html')
+    return await arender(request, 'loginpage.html')
 
 
 def logout_view(request):
     logout(request)
     return redirect('login')
     
+@cache_anonymous_page
 def home(request):
     context = {
         'user': request.user,
@@ -62,169 +106,216 @@ def home(request):
     }
     return render(request, 'index.html', context)
 
+@cache_anonymous_page
 def services(request):
     return render(request, 'services.html')
 
-def contact(request):
+@cache_anonymous_page
+async def contact(request):
     if request.method == 'POST':
-        name = request.POST.get('name')
-        email = request.POST.get('email')
-        phone = request.POST.get('phone')
-        message = request.POST.get('message')
-        ContactMessage.objects.create(name=name, email=email, phone=phone, message=message)
-        return render(request, 'contact.html', {'success': True})
-    return render(request, 'contact.html')
+        # Checked up front: the buffered insert happens later, in bulk, where
+        # one bad row would fail its whole batch.
+        form = ContactMessageForm(request.POST)
+        if not form.is_valid():
+            return await arender(request, 'contact.html', {'errors': form.errors}, status=400)
+        fields = form.cleaned_data
+        fingerprint = contact_fingerprint(fields['email'], fields['message'])
+        # Repeats are dropped but answered like any other submission, so
+        # a bot resubmitting the form learns nothing.
+        if await CONTACT_DEDUP.ais_duplicate(fingerprint):
+            pass
+        elif settings.CONTACT_INGEST_BUFFERED:
+            # Spooled locally and bulk-inserted in the background. The spool
+            # write (and fsync) blocks, so it runs off the event loop.
+            await sync_to_async(CONTACT_BUFFER.submit, thread_sensitive=False)(**fields, fingerprint=fingerprint)
+            CONTACT_DEDUP.remember(fingerprint)
+        else:
+            await ContactMessage.objects.acreate(**fields, fingerprint=fingerprint)
+            CONTACT_DEDUP.remember(fingerprint)
+        return await arender(request, 'contact.html', {'success': True})
+    return await arender(request, 'contact.html')
 
 
-@login_required(login_url='login')
-def update_profile_picture(user_profile, image_file):
-    """
-    Update user profile picture with validation and old image cleanup.
-    
-    Args:
-        user_profile: UserProfile instance
-        image_file: Uploaded image file
-        
-    Returns:
-        dict: Status and message
+@async_login_required(login_url='login')
+@csrf_exempt
+async def profile_view(request):
     """
-    try:
-        # Validate file size (max 5MB)
-        max_size = 5 * 1024 * 1024  # 5MB
-        if image_file.size > max_size:
-            return {
-                'success': False,
-                'message': 'File size must be less than 5MB'
-            }
-        
-        # Validate file type
-        valid_types = ['image/jpeg', 'image/png', 'image/gif', 'image/webp']
-        if image_file.content_type not in valid_types:
-            return {
-                'success': False,
-                'message': 'Please upload a valid image file (JPEG, PNG, GIF, or WebP)'
-            }
-        
-        # Validate image dimensions (optional)
-        try:
-            img = Image.open(image_file)
-            # Reset file pointer after PIL reads it
-            image_file.seek(0)
-            min_width, min_height = 100, 100
-            if img.width < min_width or img.height < min_height:
-                return {
-                    'success': False,
-                    'message': f'Image must be at least {min_width}x{min_height} pixels'
-                }
-        except Exception as e:
-            return {
-                'success': False,
-                'message': 'Invalid image file'
-            }
-        
-        # Delete old image if exists
-        if user_profile.profile_picture:
-            old_image_path = user_profile.profile_picture.path
-            if os.path.exists(old_image_path):
-                try:
-                    os.remove(old_image_path)
-                except Exception as e:
-                    print(f"Error deleting old image: {e}")
-        
-        # Save new image
-        user_profile.profile_picture = image_file
-        user_profile.save()
-        
-        return {
-            'success': True,
-            'message': 'Profile picture updated successfully!'
-        }
-    except Exception as e:
-        return {
-            'success': False,
-            'message': f'Error updating profile picture: {str(e)}'
-        }
+    Stream-validate picture uploads before the body is parsed.
 
+    The upload handler has to be installed before anything reads
+    request.POST, so CSRF is checked here instead of by the middleware.
+    Rejected uploads change nothing and are answered before that check.
+    Under ASGI the body is already buffered by then; its size is capped
+    earlier by ``RequestBodyLimit`` (main/uploads.py).
 
-@login_required(login_url='login')
-def remove_profile_picture(user_profile):
-    """
-    Remove user profile picture and delete the file.
-    
-    Args:
-        user_profile: UserProfile instance
-        
-    Returns:
-        dict: Status and message
+    Requests with ``Accept: application/json`` (the crop/delete buttons)
+    get ``_profile_picture_json`` instead of the page, and no flash message.
     """
-    try:
-        if user_profile.profile_picture:
-            # Get the file path before clearing the field
-            image_path = user_profile.profile_picture.path
-            
-            # Delete from database
-            user_profile.profile_picture = None
-            user_profile.save()
-            
-            # Delete physical file
-            if os.path.exists(image_path):
-                try:
-                    os.remove(image_path)
-                except Exception as e:
-                    print(f"Error deleting image file: {e}")
-            
-            return {
-                'success': True,
-                'message': 'Profile picture removed successfully!'
-            }
-        else:
-            return {
-                'success': False,
-                'message': 'No profile picture to remove'
-            }
-    except Exception as e:
-        return {
-            'success': False,
-            'message': f'Error removing profile picture: {str(e)}'
-        }
+    # Loaded with the user by ProfileModelBackend, so no extra query.
+    profile = await sync_to_async(lambda: request.user.profile)()
+    response = await _profile_view(request, profile)
+    patch_vary_headers(response, ('Accept',))
+    return response
 
 
-@login_required(login_url='login')
-@login_required
-def profile_view(request):
-    profile = request.user.profile
-
+async def _profile_view(request, profile):
     if request.method == "POST":
+        if content_length_exceeded(request):
+            return await _reject_profile_picture(request, profile, ProfilePictureRejected(SIZE_ERROR, status=413))
+        upload_guard = ProfilePictureUploadHandler(request)
+        request.upload_handlers.insert(0, upload_guard)
+        # Parse (and spool) the body off the event loop; a rejected upload stops here.
+        await sync_to_async(lambda: request.POST, thread_sensitive=False)()
+        if upload_guard.error:
+            return await _reject_profile_picture(request, profile, upload_guard.error)
 
-        # 🔍 DEBUG HERE
-        print(request.FILES)
-        print(request.POST)
+        csrf_failure = await acsrf_check(request)
+        if csrf_failure is not None:
+            return csrf_failure
 
+        message = None
         # ✅ normal upload (no crop)
         if 'profile_picture' in request.FILES:
-            profile.profile_picture = request.FILES['profile_picture']
-            profile.save()
-            messages.success(request, "Profile picture updated")
+            image_file = request.FILES['profile_picture']
+            try:
+                await run_in_executor(IMAGE_EXECUTOR, validate_image_dimensions, image_file)
+            except ProfilePictureRejected as error:
+                return await _reject_profile_picture(request, profile, error)
+            profile.profile_picture = image_file
+            await sync_to_async(profile.save)()
+            message = "Profile picture updated"
 
         # ✅ cropped image (Base64)
         elif request.POST.get("cropped_image"):
-            format, imgstr = request.POST["cropped_image"].split(";base64,")
-            ext = format.split("/")[-1]
-
-            file_name = f"profile_{uuid.uuid4()}.{ext}"
-            image_file = ContentFile(base64.b64decode(imgstr), name=file_name)
+            try:
+                image_file = await run_in_executor(IMAGE_EXECUTOR, _decode_cropped_image, request.POST["cropped_image"])
+            except ProfilePictureRejected as error:
+                return await _reject_profile_picture(request, profile, error)
 
             profile.profile_picture = image_file
-            profile.save()
-            messages.success(request, "Profile picture updated")
+            await sync_to_async(profile.save)()
+            message = "Profile picture updated"
 
         elif request.POST.get('delete_picture'):
-            profile.profile_picture.delete(save=True)
-            messages.success(request, "Profile picture removed")
+            # The file may be shared; MediaBlob deletes it once unreferenced.
+            profile.profile_picture = None
+            await sync_to_async(profile.save)()
+            message = "Profile picture removed"
+
+        if _wants_json(request):
+            return _profile_picture_json(profile, message)
+        if message:
+            messages.success(request, message)
+
+    elif _wants_json(request):
+        return _profile_picture_json(profile)
+
+    return await arender(request, "profile.html", {"profile": profile})
+
 
-    return render(request, "profile.html", {"profile": profile})
+# As rendered by profile.html.
+PROFILE_PICTURE_SIZE = 150
 
 
+def _wants_json(request):
+    return 'application/json' in request.headers.get('Accept', '')
 
 
+def _profile_picture_json(profile, message=None, status=200):
+    """
+    The profile picture as JSON, for swapping it into the page::
+
+        {"success": true, "message": "Profile picture updated",
+         "updated_at": "2025-01-01T12:00:00+00:00",
+         "picture": {"url": ..., "pending": false,
+                     "renditions": {"48": {"webp": ..., "jpeg": ...}, ...},
+                     "html": "<picture>...</picture>"}}
+
+    ``picture`` is null without a picture; ``pending`` means the renditions
+    are still being generated and ``html`` shows the original upload.
+    ``updated_at`` orders responses that cross in flight.
+    """
+    picture = None
+    if profile.profile_picture:
+        sizes = current_renditions(profile) or {}
+        picture = {
+            'url': profile.profile_picture.url,
+            'pending': not sizes,
+            'renditions': {
+                size: {ext: default_storage.url(name) for ext, name in formats.items()}
+                for size, formats in sizes.items()
+            },
+            'html': profile_picture(profile, PROFILE_PICTURE_SIZE),
+        }
+    return JsonResponse({
+        'success': status < 400,
+        'message': message,
+        'updated_at': profile.updated_at.isoformat() if profile.updated_at else None,
+        'picture': picture,
+    }, status=status)
+
+
+def _decode_cropped_image(data_url):
+    image_file = decode_data_url(data_url)
+    validate_image_dimensions(image_file)
+    return image_file
+
+
+async def _reject_profile_picture(request, profile, error):
+    if _wants_json(request):
+        return _profile_picture_json(profile, error.message, status=error.status)
+    messages.error(request, error.message)
+    return await arender(request, "profile.html", {"profile": profile}, status=error.status)
+
+
+@login_required(login_url='login')
+@require_POST
+def profile_picture_upload(request):
+    """
+    Replace the profile picture with the raw request body.
+
+    For clients that can send the image bytes directly
+    (``Content-Type: application/octet-stream`` or ``image/*``) instead of a
+    multipart form or a base64 data URL. CSRF is checked from the
+    ``X-CSRFToken`` header.
+    """
+    if request.content_type not in ('application/octet-stream',) + VALID_CONTENT_TYPES:
+        return JsonResponse({'success': False, 'message': TYPE_ERROR}, status=415)
+    if content_length_exceeded(request, overhead=0):
+        return JsonResponse({'success': False, 'message': SIZE_ERROR}, status=413)
+
+    try:
+        image_file = spool_image(iter_request_chunks(request))
+        validate_image_dimensions(image_file)
+    except ProfilePictureRejected as error:
+        return JsonResponse({'success': False, 'message': error.message}, status=error.status)
+
+    profile = request.user.profile
+    profile.profile_picture = image_file
+    profile.save()
+    return JsonResponse({
+        'success': True,
+        'message': 'Profile picture updated',
+        'url': profile.profile_picture.url,
+    })
+
+
+@staff_member_required
+@require_GET
+def contact_search(request):
+    """
+    Ranked full-text search over contact messages, for staff.
+
+    ``?q=<words>`` (every word must match) and optionally ``&limit=<n>``
+    (at most 100). Results come best match first.
+    """
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), 100)
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'limit must be a number'}, status=400)
+    if not query:
+        return JsonResponse({'success': True, 'results': []})
 
+    results = ranked_search(query, limit=limit).values('id', 'name', 'email', 'phone', 'message', 'submitted_at', 'rank')
+    return JsonResponse({'success': True, 'results': list(results)})
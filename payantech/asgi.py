@@ -3,6 +3,14 @@ ASGI config for payantech project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The login, register, contact and profile views are async, so serving this
+application keeps slow clients from pinning a worker each:
+
+    gunicorn payantech.asgi:application -k uvicorn.workers.UvicornWorker
+
+Django reads the whole request body before any view runs, so oversized
+bodies are refused in front of it (``main.uploads.RequestBodyLimit``).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
 """
@@ -13,4 +21,8 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'payantech.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from main.uploads import RequestBodyLimit  # reads settings
+
+application = RequestBodyLimit(django_application)
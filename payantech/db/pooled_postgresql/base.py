@@ -0,0 +1,54 @@
+"""
+PostgreSQL backend whose connections come from a per-process pool.
+
+Django opens a connection when a request first touches the database and
+closes it when the request ends (``CONN_MAX_AGE = 0``). With this engine
+"open" borrows an already connected session from ``pool.ConnectionPool`` and
+"close" rolls back anything left open and hands it back, so a request no
+longer pays for TCP + TLS + authentication. Configure it through the
+database's ``POOL`` dict (see settings.py):
+
+    MIN_SIZE, MAX_SIZE, TIMEOUT, MAX_LIFETIME, MAX_IDLE, HEALTH_CHECK_INTERVAL
+
+Pooled sessions must not carry per-request state. Django only sets the
+client encoding and time zone, which are the same for every request (and
+which pgbouncer tracks itself). Behind pgbouncer in transaction pooling
+mode, also set ``DISABLE_SERVER_SIDE_CURSORS`` (settings.py does, for
+``DATABASE_PGBOUNCER``): those cursors outlive a transaction.
+"""
+
+import functools
+
+import psycopg2.extras
+from django.db.backends.postgresql import base
+
+from .pool import pool_for
+
+
+def connect(conn_params, options):
+    """A new server connection, set up as the stock backend's get_new_connection() does."""
+    connection = base.Database.connect(**conn_params)
+    isolation_level = options.get('isolation_level')
+    if isolation_level is not None and isolation_level != connection.isolation_level:
+        connection.set_session(isolation_level=isolation_level)
+    psycopg2.extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+    return connection
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        # Kept for _close(): settings_dict may have changed by then (test databases).
+        self.pool = pool_for(
+            self.alias,
+            conn_params,
+            functools.partial(connect, options=self.settings_dict['OPTIONS']),
+            self.settings_dict.get('POOL', {}),
+        )
+        connection = self.pool.getconn()
+        self.isolation_level = self.settings_dict['OPTIONS'].get('isolation_level', connection.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.putconn(self.connection)
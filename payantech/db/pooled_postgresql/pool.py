@@ -0,0 +1,209 @@
+import collections
+import functools
+import logging
+import os
+import re
+import threading
+import time
+
+from django.db import OperationalError
+from psycopg2 import extensions
+
+from main.metrics import Counter, Gauge, Summary
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(OperationalError):
+    """No connection became free within the pool's ``TIMEOUT``."""
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of open psycopg2 connections.
+
+    At most ``max_size`` connections are open at once; a checkout waits up to
+    ``timeout`` seconds for one to be returned. ``min_size`` are opened in the
+    background when the pool is created and never closed for being idle;
+    above that, connections idle for ``max_idle`` seconds are closed. Every
+    connection is replaced after ``max_lifetime`` seconds, and one that sat
+    idle for ``check_interval`` seconds answers a ``SELECT 1`` before it is
+    handed out.
+    """
+
+    def __init__(self, connect, name, min_size=0, max_size=10, timeout=10.0,
+                 max_lifetime=1800.0, max_idle=300.0, check_interval=30.0):
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.check_interval = check_interval
+
+        self._cond = threading.Condition()
+        self._idle = collections.deque()  # (connection, returned at); newest on the right
+        self._opened_at = {}  # id(connection) -> monotonic time it was opened
+        self._size = 0  # open connections, idle or checked out
+
+        prefix = f'payantech_db_pool_{name}'
+        Gauge(f'{prefix}_open_connections', "Open database connections, idle or in use", lambda: self._size)
+        Gauge(f'{prefix}_idle_connections', "Open database connections waiting in the pool", lambda: len(self._idle))
+        self.wait_seconds = Summary(f'{prefix}_checkout_wait_seconds', "Time spent waiting for a pooled connection")
+        self.recycled = Counter(
+            f'{prefix}_recycled_total', "Connections closed for age, idleness or a failed health check"
+        )
+        self.timeouts = Counter(f'{prefix}_timeouts_total', "Checkouts that gave up waiting for a connection")
+
+        if min_size:
+            threading.Thread(target=self._fill, name=f'db-pool-{name}', daemon=True).start()
+
+    def getconn(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        while True:
+            with self._cond:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts.inc()
+                        raise PoolTimeout(
+                            f"No database connection free after {self.timeout}s ({self.max_size} in use)"
+                        )
+                    self._cond.wait(remaining)
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                else:
+                    conn, returned_at = None, None
+                    self._size += 1
+
+            if conn is None:
+                try:
+                    conn = self._open()
+                except BaseException:
+                    self._forget(None)
+                    raise
+            elif not self._usable(conn, returned_at):
+                self._forget(conn)
+                continue
+            self.wait_seconds.observe(time.monotonic() - started)
+            return conn
+
+    def putconn(self, conn):
+        """Return ``conn``; it is rolled back, or closed if broken or too old."""
+        if conn.closed or time.monotonic() - self._opened_at.get(id(conn), 0) > self.max_lifetime:
+            self._forget(conn)
+            return
+        if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception:
+                self._forget(conn)
+                return
+
+        now = time.monotonic()
+        stale = []
+        with self._cond:
+            self._idle.append((conn, now))
+            while self._size - len(stale) > self.min_size and self._idle and now - self._idle[0][1] > self.max_idle:
+                stale.append(self._idle.popleft()[0])
+            self._cond.notify()
+        for conn in stale:
+            self._forget(conn)
+
+    def _open(self):
+        conn = self._connect()
+        self._opened_at[id(conn)] = time.monotonic()
+        return conn
+
+    def _usable(self, conn, returned_at):
+        now = time.monotonic()
+        if conn.closed or now - self._opened_at.get(id(conn), 0) > self.max_lifetime:
+            return False
+        if now - returned_at < self.check_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if not conn.autocommit:
+                conn.rollback()
+        except Exception:
+            return False
+        return True
+
+    def _forget(self, conn):
+        """Close ``conn`` (None: one that failed to open) and free its slot."""
+        if conn is not None:
+            self._opened_at.pop(id(conn), None)
+            self.recycled.inc()
+            try:
+                conn.close()
+            except Exception:
+                pass
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _after_fork(self):
+        """Drop (without closing) what the parent process had open."""
+        self._idle.clear()
+        self._opened_at.clear()
+        self._size = 0
+        self._cond = threading.Condition()
+        if self.min_size:
+            threading.Thread(target=self._fill, daemon=True).start()
+
+    def _fill(self):
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._open()
+            except Exception:
+                self._forget(None)
+                logger.warning("Could not pre-open pooled database connections", exc_info=True)
+                return
+            with self._cond:
+                self._idle.appendleft((conn, time.monotonic()))
+                self._cond.notify()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def pool_for(alias, conn_params, connect, options):
+    """
+    The pool for ``alias`` connected with ``conn_params``, created on first
+    use. (The test runner reuses an alias for the test database.)
+    """
+    key = (alias, repr(sorted(conn_params.items())))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            same_alias = sum(1 for other, _ in _pools if other == alias)
+            name = re.sub(r'\W', '_', alias) + (f'_{same_alias}' if same_alias else '')
+            pool = _pools[key] = ConnectionPool(
+                functools.partial(connect, conn_params),
+                name=name,
+                min_size=options.get('MIN_SIZE', 0),
+                max_size=options.get('MAX_SIZE', 10),
+                timeout=options.get('TIMEOUT', 10.0),
+                max_lifetime=options.get('MAX_LIFETIME', 1800.0),
+                max_idle=options.get('MAX_IDLE', 300.0),
+                check_interval=options.get('HEALTH_CHECK_INTERVAL', 30.0),
+            )
+        return pool
+
+
+def _reset_after_fork():
+    # Inherited sockets belong to the parent (e.g. gunicorn --preload); never touch them here.
+    global _pools_lock
+    _pools_lock = threading.Lock()
+    for pool in _pools.values():
+        pool._after_fork()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,116 @@
+"""
+Reads from replicas, writes to the primary, and read-your-writes.
+
+``PrimaryReplicaRouter`` sends a request's queries to one of
+``DATABASE_REPLICAS`` (picked once per request) and every write to
+``default``. A replica may lag behind, so once a request writes:
+
+* its remaining reads go to the primary, and
+* ``primary_pinning_middleware`` sets a cookie that sends the browser's
+  requests for the next ``DATABASE_PIN_SECONDS`` to the primary too, e.g. so
+  the profile page shows the picture that was just uploaded.
+
+Reads inside ``transaction.atomic()`` on the primary stay there, and so does
+everything outside a request (management commands, the rendition and contact
+flush threads), which usually reads what it has just written.
+
+Locally, point ``DATABASE_REPLICA_URLS`` at a second SQLite file and copy the
+primary into it with ``manage.py replicate_sqlite``.
+"""
+
+import asyncio
+import contextvars
+import random
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.decorators import sync_and_async_middleware
+
+PIN_COOKIE = 'db_primary'
+
+
+class RequestState:
+    __slots__ = ('pinned', 'wrote', 'replica')
+
+    def __init__(self, pinned):
+        self.pinned = pinned  # a recent request of this browser wrote
+        self.wrote = False
+        self.replica = None
+
+    @property
+    def primary_only(self):
+        return self.pinned or self.wrote
+
+
+_request_state = contextvars.ContextVar('db_request_state', default=None)
+
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', ())
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = replica_aliases()
+        state = _request_state.get()
+        if not replicas or state is None or state.primary_only or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if state.replica is None:
+            state.replica = random.choice(replicas)
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary.
+        return db not in replica_aliases()
+
+
+@sync_and_async_middleware
+def primary_pinning_middleware(get_response):
+    """Route the request's reads (see ``PrimaryReplicaRouter``) and pin writers to the primary."""
+    def start(request):
+        state = RequestState(pinned=PIN_COOKIE in request.COOKIES)
+        return state, _request_state.set(state)
+
+    def finish(response, state, token):
+        _request_state.reset(token)
+        if state.wrote and replica_aliases():
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=getattr(settings, 'DATABASE_PIN_SECONDS', 5),
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            state, token = start(request)
+            try:
+                response = await get_response(request)
+            except BaseException:
+                _request_state.reset(token)
+                raise
+            return finish(response, state, token)
+    else:
+        def middleware(request):
+            state, token = start(request)
+            try:
+                response = get_response(request)
+            except BaseException:
+                _request_state.reset(token)
+                raise
+            return finish(response, state, token)
+    return middleware
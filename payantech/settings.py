@@ -14,6 +14,7 @@ from pathlib import Path
 import os
 from dotenv import load_dotenv
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 
 # Load environment variables from .env file
 load_dotenv()
@@ -57,6 +58,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    # Before anything that queries (sessions, auth): picks the database for reads.
+    'payantech.db.replicas.primary_pinning_middleware',
 
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -87,6 +90,14 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'payantech.wsgi.application'
+ASGI_APPLICATION = 'payantech.asgi.application'
+
+# Thread pools the async views hand blocking work to (see main/asyncutils.py)
+PASSWORD_HASHING_WORKERS = int(os.environ.get('PASSWORD_HASHING_WORKERS', 4))
+# Logins/registrations allowed to wait for a hashing slot before we answer 503
+PASSWORD_HASHING_QUEUE_SIZE = int(os.environ.get('PASSWORD_HASHING_QUEUE_SIZE', 32))
+PASSWORD_HASHING_RETRY_AFTER = 5
+IMAGE_EXECUTOR_WORKERS = int(os.environ.get('IMAGE_EXECUTOR_WORKERS', 2))
 
 
 # Database
@@ -107,11 +118,57 @@ DATABASES = {
 import os
 import dj_database_url
 
+DATABASE_CONN_MAX_AGE = int(os.environ.get('DATABASE_CONN_MAX_AGE', 0))
 DATABASES = {
     'default': dj_database_url.config(
-        default=os.environ.get('DATABASE_URL')
+        default=os.environ.get('DATABASE_URL'),
+        # Seconds to keep a connection open between requests (0: close after each).
+        conn_max_age=DATABASE_CONN_MAX_AGE,
+        conn_health_checks=True,
+    )
+}
+
+# Read replicas: DATABASE_REPLICA_URLS is a comma-separated list of URLs
+# (e.g. sqlite:////tmp/replica.db locally, see `manage.py replicate_sqlite`).
+# Requests read from one of them until they write; see payantech/db/replicas.py.
+for index, url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(','))):
+    DATABASES[f'replica_{index}'] = dict(
+        dj_database_url.parse(url.strip(), conn_max_age=DATABASE_CONN_MAX_AGE, conn_health_checks=True),
+        # Tests read and write the one test database.
+        TEST={'MIRROR': 'default'},
     )
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['payantech.db.replicas.PrimaryReplicaRouter']
+# How long a browser that wrote keeps reading from the primary; at least the replication lag.
+DATABASE_PIN_SECONDS = int(os.environ.get('DATABASE_PIN_SECONDS', 5))
+
+# DATABASE_POOL=true: Postgres connections come from a per-process pool
+# (payantech/db/pooled_postgresql) and go back to it after each request.
+# DATABASE_PGBOUNCER=true when DATABASE_URL points at pgbouncer in
+# transaction pooling mode.
+DATABASE_POOL = os.environ.get('DATABASE_POOL', 'false').lower() == 'true'
+DATABASE_PGBOUNCER = os.environ.get('DATABASE_PGBOUNCER', 'false').lower() == 'true'
+DATABASE_POOL_OPTIONS = {
+    'MIN_SIZE': int(os.environ.get('DATABASE_POOL_MIN_SIZE', 1)),
+    'MAX_SIZE': int(os.environ.get('DATABASE_POOL_MAX_SIZE', 10)),
+    # Seconds a request waits for a free connection before failing.
+    'TIMEOUT': float(os.environ.get('DATABASE_POOL_TIMEOUT', 10)),
+    'MAX_LIFETIME': float(os.environ.get('DATABASE_POOL_MAX_LIFETIME', 1800)),
+    'MAX_IDLE': float(os.environ.get('DATABASE_POOL_MAX_IDLE', 300)),
+    'HEALTH_CHECK_INTERVAL': float(os.environ.get('DATABASE_POOL_HEALTH_CHECK_INTERVAL', 30)),
 }
+for database in DATABASES.values():
+    if database.get('ENGINE') != 'django.db.backends.postgresql':
+        continue
+    # Server-side cursors outlive the transaction pgbouncer lends us a server for.
+    database['DISABLE_SERVER_SIDE_CURSORS'] = DATABASE_PGBOUNCER
+    if DATABASE_POOL:
+        database.update(
+            ENGINE='payantech.db.pooled_postgresql',
+            # Returned to the pool when the request ends, not kept by the thread.
+            CONN_MAX_AGE=0,
+            POOL=DATABASE_POOL_OPTIONS,
+        )
 
 
 
@@ -134,6 +191,15 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Loads the session user and their profile in one query (see main/auth.py).
+# ModelBackend stays listed so sessions it logged in remain valid.
+AUTHENTICATION_BACKENDS = ['main.auth.ProfileModelBackend', 'django.contrib.auth.backends.ModelBackend']
+USER_PROFILE_CACHE = os.environ.get('USER_PROFILE_CACHE', 'false').lower() == 'true'
+USER_PROFILE_CACHE_TIMEOUT = 300
+if USER_PROFILE_CACHE and not os.environ.get('REDIS_URL'):
+    # A per-process cache would keep serving a deactivated user from the other workers.
+    raise ImproperlyConfigured("USER_PROFILE_CACHE needs a shared cache; set REDIS_URL")
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.1/topics/i18n/
@@ -156,12 +222,47 @@ STATICFILES_DIRS = [
     BASE_DIR / 'main' / 'static'
 ]
 
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# WhiteNoise's compressed manifest storage, plus resized AVIF/WebP variants
+# of static images for {% responsive_image %} (see main/responsive.py)
+STATICFILES_STORAGE = 'main.responsive.ResponsiveStaticFilesStorage'
+RESPONSIVE_IMAGE_WIDTHS = (160, 320, 640, 1024, 1600)
 
 # Media files configuration
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Let the front proxy send media bytes: 'nginx' (X-Accel-Redirect) or
+# 'apache' (X-Sendfile). Unset, Django streams the files itself.
+MEDIA_OFFLOAD = os.environ.get('MEDIA_OFFLOAD') or None
+MEDIA_ACCEL_REDIRECT_PREFIX = os.environ.get('MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+
+# Profile picture renditions (see main/renditions.py)
+PROFILE_PICTURE_RENDITION_SIZES = (48, 96, 300)
+PROFILE_PICTURE_RENDITION_WORKERS = 2
+
+
+# Contact form write-behind buffer (see main/ingest.py)
+CONTACT_INGEST_BUFFERED = os.environ.get('CONTACT_INGEST_BUFFERED', 'true').lower() == 'true'
+CONTACT_INGEST_BATCH_SIZE = 200
+CONTACT_INGEST_FLUSH_INTERVAL = 2.0
+CONTACT_INGEST_SPOOL_DIR = BASE_DIR / 'var' / 'contact_spool'
+
+# Identical contact submissions within this many seconds are dropped
+# (0 disables; see main/dedup.py)
+CONTACT_DEDUP_WINDOW = 3600
+CONTACT_DEDUP_BLOOM_CAPACITY = 100000
+CONTACT_DEDUP_LRU_SIZE = 10000
+
+# Contact messages older than this move to compressed segments (see main/archive.py)
+CONTACT_ARCHIVE_AFTER_DAYS = 90
+CONTACT_ARCHIVE_DIR = BASE_DIR / 'var' / 'contact_archive'
+
+# Who may read /metrics/ besides staff users
+METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')
+
+# Admin changelist counts (see main/pagination.py)
+ESTIMATED_COUNT_THRESHOLD = 10000
+ESTIMATED_COUNT_CACHE_TIMEOUT = 60
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
@@ -177,3 +278,52 @@ CSRF_COOKIE_SECURE = False
 CSRF_COOKIE_HTTPONLY = False
 SESSION_COOKIE_SECURE = False
 SESSION_COOKIE_HTTPONLY = False
+
+# Cache: Redis when REDIS_URL is set (shared by all workers), otherwise
+# per-process memory. 'pages' holds anonymous page responses and template
+# fragments (see main/caching.py); without Redis it is a directory shared by
+# the workers on this machine.
+PAGE_CACHE_TIMEOUT = 300
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'pages': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'var' / 'page_cache',
+        'TIMEOUT': PAGE_CACHE_TIMEOUT,
+        'KEY_FUNCTION': 'main.caching.make_page_key',
+    },
+}
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        },
+        'pages': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+            'TIMEOUT': PAGE_CACHE_TIMEOUT,
+            'KEY_PREFIX': 'pages',
+            'KEY_FUNCTION': 'main.caching.make_page_key',
+        },
+    }
+
+# Session storage, chosen with SESSION_MODE (compare them with
+# `manage.py benchmark_sessions`):
+#   db              - a django_session read per request, write on change (default)
+#   cached_db       - reads from the cache, writes through to the database; needs REDIS_URL
+#   cache           - cache only; needs REDIS_URL, sessions go if Redis is flushed
+#   signed_cookies  - no server storage; the session lives in a signed cookie
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_MODE = os.environ.get('SESSION_MODE', 'db')
+SESSION_ENGINE = SESSION_ENGINES[SESSION_MODE]
+if SESSION_MODE in ('cache', 'cached_db') and not os.environ.get('REDIS_URL'):
+    # In the per-process cache, a session (or its logout) would only exist in one worker.
+    raise ImproperlyConfigured(f"SESSION_MODE={SESSION_MODE} needs a shared cache; set REDIS_URL")
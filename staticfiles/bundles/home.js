@@ -0,0 +1,19 @@
+document.addEventListener("DOMContentLoaded",function(){const textEl=document.querySelector(".text");if(textEl&&typeof Typed!=="undefined"){new Typed(textEl,{strings:["INNOVATE","INTEGRATE","ELEVATE"],typeSpeed:100,backSpeed:100,backDelay:1000,loop:true
+});}
+const btn=document.querySelector(".btn");if(btn){btn.addEventListener("click",()=>{alert("Exploring PAYANTECH’s innovations!");});}
+const hero=document.querySelector(".fade-on-scroll");const navbar=document.querySelector(".navbar");window.addEventListener("scroll",()=>{let scrollY=window.scrollY;if(hero){hero.style.opacity=Math.max(1-scrollY/400,0);}
+if(navbar){navbar.classList.toggle("scrolled",scrollY>50);}
+});const revealEls=document.querySelectorAll(
+".reveal, .reveal-left, .reveal-right, footer"
+);if(revealEls.length){const observer=new IntersectionObserver(entries=>{entries.forEach(entry=>{if(entry.isIntersecting){entry.target.classList.add("show");}
+});},{threshold:0.2});revealEls.forEach(el=>observer.observe(el));}
+const navbarToggle=document.querySelector(".navbar-toggle");const navbarMenu=document.querySelector(".navbar-menu");if(navbarToggle&&navbarMenu){navbarToggle.addEventListener("click",()=>{navbarToggle.classList.toggle("active");navbarMenu.classList.toggle("active");});}
+});document.addEventListener('DOMContentLoaded',function(){function showNotification(message,type){const existingNotif=document.querySelector('.notification');if(existingNotif){existingNotif.remove();}
+const notification=document.createElement('div');notification.classList.add('notification',type);notification.innerHTML=`
+            <span>${message}</span>
+            <button class="close-btn">&times;</button>
+        `;document.body.insertBefore(notification,document.body.firstChild);notification.querySelector('.close-btn').addEventListener('click',function(){notification.remove();});setTimeout(()=>{if(notification.parentNode){notification.remove();}
+},5000);}
+const djangoMessages=document.querySelectorAll('.django-message');if(djangoMessages.length>0){djangoMessages.forEach(msg=>{const messageText=msg.textContent.trim();const messageType=msg.getAttribute('data-type')||'error';if(messageText){showNotification(messageText,messageType);}
+});}
+});
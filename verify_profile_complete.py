@@ -169,7 +169,48 @@ try:
 except Exception as e:
     print_check(False, f"Image test error: {e}")
 
-# 11. Summary
+# 11. Admin Changelist Queries
+print_section("11. ADMIN CHANGELIST QUERIES")
+try:
+    from django.contrib import admin
+    from django.db import connection, transaction
+    from django.test import RequestFactory
+    from django.test.utils import CaptureQueriesContext
+
+    def changelist_queries(per_page):
+        model_admin = admin.site._registry[UserProfile]
+        model_admin.list_per_page = per_page
+        request = RequestFactory().get('/admin/main/userprofile/')
+        request.user = User(is_active=True, is_staff=True, is_superuser=True)
+        with CaptureQueriesContext(connection) as queries:
+            model_admin.changelist_view(request).render()
+        return len(queries)
+
+    class Rollback(Exception):
+        pass
+
+    try:
+        with transaction.atomic():
+            # Enough rows of our own (pictures with renditions, failed ones,
+            # none) that a per-row query would show; rolled back below.
+            for i in range(5):
+                user = User.objects.create(username=f'changelist-check-{i}')
+                sizes = {'48': {'jpeg': f'profile_pics/renditions/check-{i}-48.jpg'}} if i % 2 else {}
+                UserProfile.objects.filter(user=user).update(
+                    profile_picture=f'profile_pics/check-{i}.jpg' if i else '',
+                    profile_picture_renditions={'source': f'profile_pics/check-{i}.jpg', 'sizes': sizes} if i else {},
+                )
+            rows = min(UserProfile.objects.count(), 100)
+            small, page = changelist_queries(1), changelist_queries(100)
+            raise Rollback
+    except Rollback:
+        pass
+    admin.site._registry[UserProfile].list_per_page = 100
+    print_check(small == page, f"{rows}-row page costs {page} queries, a 1-row page {small}")
+except Exception as e:
+    print_check(False, f"Admin query check error: {e}")
+
+# 12. Summary
 print_section("SUMMARY")
 print("""
 The profile picture system is FULLY CONFIGURED and READY TO USE.